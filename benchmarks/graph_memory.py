@@ -0,0 +1,68 @@
+"""Memory benchmark for holding a corpus of sentence graphs: Token graphs vs CompactSentence.
+
+Builds a corpus of --sentences sentences (100k by default) out of the handcrafted test sentences,
+optionally converts it, and reports the traced memory of holding the whole corpus as Token graphs
+and as CompactSentence objects, and the time it takes to compact and to restore it.
+
+usage (from the repository root): python -m benchmarks.graph_memory [--sentences N] [--convert]
+"""
+import argparse
+import gc
+import math
+import pathlib
+import time
+import tracemalloc
+
+from pybart.api import compile_conversions
+from pybart.conllu_wrapper import parse_conllu
+from pybart.converter import Convert
+from pybart.graph_token import CompactSentence
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=100000)
+    parser.add_argument("--convert", action="store_true", help="hold the converted graphs instead of the parsed ones")
+    args = parser.parse_args()
+
+    with open(pathlib.Path(__file__).parent.parent / "tests" / "handcrafted_tests.conllu") as f:
+        text = f.read()
+    compiled = compile_conversions() if args.convert else None
+
+    def build_tokens():
+        corpus = []
+        while len(corpus) < args.sentences:
+            parsed, _ = parse_conllu(text)
+            parsed = parsed[:args.sentences - len(corpus)]
+            if compiled is not None:
+                parsed, _ = Convert(parsed, True, True, True, math.inf, False, False, False, False, False, None, 1, None, compiled)()
+            corpus.extend(parsed)
+        return corpus
+
+    corpus, tokens_size, _ = traced(build_tokens)
+    tokens_count = sum(len(sentence) for sentence in corpus)
+    compact, compact_size, compact_time = traced(lambda: [CompactSentence(sentence) for sentence in corpus])
+    del corpus
+    _, _, restore_time = traced(lambda: [sentence.to_tokens() for sentence in compact])
+
+    print(f"{len(compact)} sentences, {tokens_count} tokens{' (converted)' if args.convert else ''}")
+    print(f"Token graphs:     {tokens_size / 2 ** 20:8.1f} MiB ({tokens_size / tokens_count:.0f} bytes/token)")
+    print(f"CompactSentence:  {compact_size / 2 ** 20:8.1f} MiB ({compact_size / tokens_count:.0f} bytes/token), "
+          f"x{tokens_size / compact_size:.1f} smaller")
+    print(f"compact in {compact_time:.2f}s, restore in {restore_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Regression benchmark: a compiled matcher that is reused across sentences must keep flat memory and latency.
+
+Converts the handcrafted test sentences over and over (1M sentences by default) with one shared set of compiled
+conversions, and reports the latency and the traced memory of every window of sentences.
+The last window should be about as fast and as small as the first one.
+
+usage (from the repository root): python -m benchmarks.matcher_reuse [--sentences N] [--window N]
+"""
+import argparse
+import math
+import pathlib
+import time
+import tracemalloc
+
+from pybart.api import compile_conversions
+from pybart.conllu_wrapper import parse_conllu
+from pybart.converter import Convert
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=1000000)
+    parser.add_argument("--window", type=int, default=10000)
+    args = parser.parse_args()
+
+    with open(pathlib.Path(__file__).parent.parent / "tests" / "handcrafted_tests.conllu") as f:
+        text = f.read()
+    compiled = compile_conversions()
+
+    tracemalloc.start()
+    done = 0
+    while done < args.sentences:
+        start = time.perf_counter()
+        cur_window = min(args.window, args.sentences - done)
+        converted = 0
+        while converted < cur_window:
+            # parse again each time, as the conversion is done in place
+            parsed, _ = parse_conllu(text)
+            parsed = parsed[:cur_window - converted]
+            Convert(parsed, True, True, True, math.inf, False, False, False, False, False, None, 1, None, compiled)()
+            converted += len(parsed)
+        done += cur_window
+        elapsed = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        print(f"sentences={done}\tms_per_sentence={1000 * elapsed / cur_window:.3f}\ttraced_kb={current / 1024:.0f}")
+
+
+if __name__ == "__main__":
+    main()
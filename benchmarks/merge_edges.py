@@ -0,0 +1,116 @@
+"""Micro-benchmark of GlobalMatcher._merge_edges_assignments.
+
+Collects the edge assignments of every conversion on every sentence of a workload (in its converted state, where the
+graphs are denser), and times the merge against a reference merge in declared order with the distance/concat
+filters applied only at the end (the way it used to be done), checking that both give the same matches.
+The workloads are the handcrafted test sentences (or a given CoNLL-U file), where most edges have a single assignment,
+and synthetic coordination-heavy sentences, where the conjuncts multiply the assignments of the edges.
+
+usage (from the repository root): python -m benchmarks.merge_edges [--repeat N] [--conllu PATH] [--conjuncts N]
+"""
+import argparse
+import math
+import pathlib
+import time
+from collections import defaultdict
+
+from pybart.api import compile_conversions
+from pybart.conllu_wrapper import parse_conllu
+from pybart.converter import Convert
+from pybart.matcher import GlobalMatcher
+
+
+def reference_merge(edges_assignments, is_consistent):
+    merges = []
+    for edge_is_optional, edge_assignments in edges_assignments:
+        new_merges = []
+        for merged in (merges if merges else [{}]):
+            edge_added = False
+            for assignment in edge_assignments:
+                just_merged = GlobalMatcher._try_merge(merged, assignment)
+                if just_merged:
+                    edge_added = True
+                    new_merges.append(just_merged)
+            if not edge_added and edge_is_optional:
+                new_merges.append(merged)
+        if not new_merges:
+            return []
+        merges = new_merges
+    return [merged for merged in merges if is_consistent is None or is_consistent(merged)]
+
+
+def coordination_sentence(conjuncts):
+    # "man saw0 dog0 in park0 on hill0 , saw1 dog1 , saw2 dog2 in park2 on hill2 and saw3 dog3 ." (for 4 conjuncts),
+    #   with the cc and punct attached to the first conjunct. every conjunct adds assignments to the conj, nmod and
+    #   case edges, so the constraints that join them (e.g. the propagation of nmods between conjuncts) have
+    #   many combinations to merge
+    rows = [("man", "man", "NN", 2, "nsubj")]
+    first = 2
+    for i in range(conjuncts):
+        if i:
+            separator = "and" if i == conjuncts - 1 else ","
+            rows.append((separator, separator, "CC" if separator == "and" else ",", first, "cc" if separator == "and" else "punct"))
+        verb = len(rows) + 1
+        rows.append((f"saw{i}", "see", "VBD", 0 if i == 0 else first, "root" if i == 0 else "conj"))
+        rows.append((f"dog{i}", "dog", "NN", verb, "dobj"))
+        # every other conjunct has no nmod of its own, so it can receive those of the first one
+        if i % 2 == 0:
+            for case, noun in [("in", "park"), ("on", "hill")]:
+                rows.append((case, case, "IN", len(rows) + 2, "case"))
+                rows.append((f"{noun}{i}", noun, "NN", verb, "nmod"))
+    rows.append((".", ".", ".", first, "punct"))
+    return "\n".join(f"{i}\t{form}\t{lemma}\t_\t{xpos}\t_\t{head}\t{deprel}\t_\t_"
+                     for i, (form, lemma, xpos, head, deprel) in enumerate(rows, 1))
+
+
+def collect_cases(conllu_text, compiled):
+    parsed, _ = parse_conllu(conllu_text)
+    Convert(parsed, True, True, True, math.inf, False, False, False, False, False, None, 1, None, compiled)()
+
+    cases = []
+    for sentence in parsed:
+        sentence = [tok for tok in sentence if tok.get_conllu_field("id").major != 0]
+        m = compiled.matcher(sentence)
+        for name in m.names():
+            matches = m.token_matchers[name].apply(sentence)
+            if matches is None:
+                continue
+            gm = m.global_matchers[name]
+            filtered = gm._filter_edge_constraints(matches, sentence, defaultdict(set))
+            is_consistent = None
+            if gm.constraint.distances or gm.constraint.concats:
+                is_consistent = (lambda gm_, sentence_: lambda assignment: gm_._filter_distance_constraints(
+                    assignment) and gm_._filter_concat_constraints(assignment, sentence_))(gm, sentence)
+            cases.append((filtered, is_consistent))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--conllu", default=str(pathlib.Path(__file__).parent.parent / "tests" / "handcrafted_tests.conllu"))
+    parser.add_argument("--conjuncts", type=int, default=24, help="the most conjuncts per coordination in the synthetic workload")
+    args = parser.parse_args()
+
+    with open(args.conllu) as f:
+        conllu_text = f.read()
+    compiled = compile_conversions()
+    workloads = [("handcrafted", conllu_text),
+                 ("coordination", "\n\n".join(coordination_sentence(conjuncts) for conjuncts in range(2, args.conjuncts + 1, 2)))]
+
+    for workload, text in workloads:
+        cases = collect_cases(text, compiled)
+        for filtered, is_consistent in cases:
+            assert GlobalMatcher._merge_edges_assignments(filtered, is_consistent) == \
+                reference_merge(filtered, is_consistent)
+
+        for title, merge in [("reference", reference_merge), ("planned", GlobalMatcher._merge_edges_assignments)]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for filtered, is_consistent in cases:
+                    merge(filtered, is_consistent)
+            print(f"{workload}\t{title}\tmerges={len(cases)}\tms_total={1000 * (time.perf_counter() - start) / args.repeat:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Scaling benchmark for the process-pool conversion engine.
+
+Converts a corpus made of the handcrafted test sentences (repeated --copies times) with ParallelConverter,
+once per worker count, and reports the throughput and the speedup over a single in-process worker.
+The outputs of all the runs are checked to be identical.
+
+usage (from the repository root): python -m benchmarks.parallel_conversion [--workers 1 2 4 ...] [--chunk-size N]
+"""
+import argparse
+import io
+import os
+import pathlib
+import time
+
+from pybart.parallel import ParallelConverter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count()}))
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--copies", type=int, default=200)
+    parser.add_argument("--conllu", help="a CoNLL-U file to convert instead of the handcrafted test sentences")
+    args = parser.parse_args()
+
+    path = args.conllu or (pathlib.Path(__file__).parent.parent / "tests" / "handcrafted_tests.conllu")
+    with open(path) as f:
+        text = f.read().strip()
+    lines = ("\n\n".join([text] * args.copies) + "\n").splitlines(keepends=True)
+
+    base_rate = None
+    base_output = None
+    for workers in args.workers:
+        out = io.StringIO()
+        with ParallelConverter(workers=workers, chunk_size=args.chunk_size) as parallel_converter:
+            start = time.perf_counter()
+            count = parallel_converter.convert_conllu_stream(lines, out)
+            elapsed = time.perf_counter() - start
+        rate = count / elapsed
+        if base_rate is None:
+            base_rate, base_output = rate, out.getvalue()
+        assert out.getvalue() == base_output, "the output depends on the number of workers"
+        print(f"workers={workers:3d}: {count} sentences in {elapsed:.2f}s, {rate:.0f} sentences/s, "
+              f"speedup x{rate / base_rate:.2f}")
+
+
+if __name__ == "__main__":
+    main()
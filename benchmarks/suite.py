@@ -0,0 +1,271 @@
+"""Throughput benchmark suite of the conversion pipeline, with machine-readable output for regression tracking.
+
+Every stage is timed on synthetic corpora of controlled sentence length (--lengths tokens per sentence,
+--sentences sentences per corpus):
+    parse_conllu, parse_odin, parse_spike_sentence        parsing of each input format
+    compile_conversions, matcher_construction/<conv>      building the conversions and the Matcher of each conversion
+    matching/<conv>                                       matching each conversion's constraint on the parsed corpus
+    convert_sentence                                      the conversion fixpoint (also reports the iterations)
+    serialize_conllu, spacy_graphs                        serialization and the spaCy graph build (needs spaCy)
+    convert_bart_conllu                                   end-to-end, with the conversions compiled beforehand
+
+The results are written as JSON (to --output, or to stdout). Given a previous result file as --baseline,
+the cases whose best time got slower by more than --tolerance are reported, and the exit status is 1.
+
+usage (from the repository root):
+    python -m benchmarks.suite [--lengths 10 25 50 100] [--sentences N] [--repeat N] [--output PATH]
+                               [--baseline PATH] [--tolerance 0.2]
+"""
+import argparse
+import datetime
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+from pybart.api import compile_conversions, convert_bart_conllu
+from pybart.conllu_wrapper import parse_conllu, parse_odin, parse_spike_sentence, serialize_conllu
+from pybart.converter import Convert, assign_ccs_to_conjs
+from pybart.matcher import Matcher, NamedConstraint
+
+# a clause of the synthetic sentences: (form, lemma, upos, xpos, head index within the clause, deprel),
+#   where the clause's verb (CLAUSE_VERB) has no head within the clause
+CLAUSE = [
+    ("The", "the", "DET", "DT", 2, "det"),
+    ("old", "old", "ADJ", "JJ", 2, "amod"),
+    ("{noun}", "{noun}", "NOUN", "NN", 3, "nsubj"),
+    ("{verb}ed", "{verb}", "VERB", "VBD", None, None),
+    ("the", "the", "DET", "DT", 5, "det"),
+    ("{noun}", "{noun}", "NOUN", "NN", 3, "dobj"),
+    ("in", "in", "ADP", "IN", 8, "case"),
+    ("the", "the", "DET", "DT", 8, "det"),
+    ("{noun}", "{noun}", "NOUN", "NN", 5, "nmod"),
+    ("while", "while", "SCONJ", "IN", 10, "mark"),
+    ("{verb}ing", "{verb}", "VERB", "VBG", 3, "advcl"),
+    ("and", "and", "CCONJ", "CC", 12, "cc"),
+    ("{verb}ing", "{verb}", "VERB", "VBG", 10, "conj"),
+]
+# the shortest sentence: a subject, a verb and an object (and the final punctuation)
+SHORT_CLAUSE = [
+    ("{noun}", "{noun}", "NOUN", "NN", 1, "nsubj"),
+    ("{verb}ed", "{verb}", "VERB", "VBD", None, None),
+    ("{noun}", "{noun}", "NOUN", "NN", 1, "dobj"),
+]
+CLAUSE_VERB = 3
+NOUNS = ["man", "dog", "park", "house", "car", "friend", "city", "book"]
+VERBS = ["walk", "jump", "look", "play", "visit", "watch", "call", "help"]
+
+
+def make_sentence(length, rng):
+    # a sentence of exactly `length` tokens (at least 4) as (form, lemma, upos, xpos, head, deprel) with 1-based heads.
+    #   clauses are coordinated to the first verb for as long as they fit, and the rest is filled with adverbs.
+    rows = []
+
+    def add_clause(clause, head, deprel):
+        start = len(rows)
+        noun, verb = rng.choice(NOUNS), rng.choice(VERBS)
+        for form, lemma, upos, xpos, clause_head, clause_deprel in clause:
+            rows.append((form.format(noun=noun, verb=verb), lemma.format(noun=noun, verb=verb), upos, xpos,
+                         head if clause_head is None else start + clause_head + 1,
+                         deprel if clause_head is None else clause_deprel))
+        return start + next(i for i, row in enumerate(clause) if row[4] is None) + 1
+
+    root = add_clause(CLAUSE if length > len(CLAUSE) else SHORT_CLAUSE, 0, "root")
+    while len(rows) + len(CLAUSE) + 2 <= length:
+        # the cc attaches to the verb of the clause that follows it
+        rows.append(("and", "and", "CCONJ", "CC", len(rows) + 2 + CLAUSE_VERB, "cc"))
+        add_clause(CLAUSE, root, "conj")
+    while len(rows) + 1 < length:
+        rows.append(("quickly", "quickly", "ADV", "RB", root, "advmod"))
+    rows.append((".", ".", "PUNCT", ".", root, "punct"))
+    return rows
+
+
+def to_conllu(sentences):
+    return "\n\n".join("\n".join(f"{i}\t{form}\t{lemma}\t{upos}\t{xpos}\t_\t{head}\t{deprel}\t_\t_"
+                                 for i, (form, lemma, upos, xpos, head, deprel) in enumerate(rows, 1))
+                       for rows in sentences) + "\n"
+
+
+def to_spike(rows):
+    return {"words": [row[0] for row in rows], "lemmas": [row[1] for row in rows], "pos": [row[3] for row in rows],
+            "graphs": {"universal-basic": {
+                "edges": [{"parent": row[4] - 1, "child": i, "label": row[5]} for i, row in enumerate(rows) if row[4] != 0],
+                "roots": [i for i, row in enumerate(rows) if row[4] == 0]}}}
+
+
+def to_odin(sentences):
+    text = ""
+    odin_sentences = []
+    for rows in sentences:
+        start_offsets, end_offsets = [], []
+        for form, *_ in rows:
+            start_offsets.append(len(text))
+            text += form
+            end_offsets.append(len(text))
+            text += " "
+        odin_sentences.append({
+            "words": [row[0] for row in rows], "lemmas": [row[1] for row in rows], "tags": [row[3] for row in rows],
+            "startOffsets": start_offsets, "endOffsets": end_offsets,
+            "graphs": {"universal-basic": {
+                "edges": [{"source": row[4] - 1, "destination": i, "relation": row[5]} for i, row in enumerate(rows) if row[4] != 0],
+                "roots": [i for i, row in enumerate(rows) if row[4] == 0]}}})
+    return {"text": text, "sentences": odin_sentences}
+
+
+def to_spacy_doc(sentences):
+    import spacy
+    from spacy.tokens import Doc
+    rows = [row for sentence in sentences for row in sentence]
+    heads, offset = [], 0
+    for sentence in sentences:
+        heads.extend((offset + row[4] - 1) if row[4] != 0 else (offset + i) for i, row in enumerate(sentence))
+        offset += len(sentence)
+    return Doc(spacy.blank("en").vocab, words=[row[0] for row in rows], lemmas=[row[1] for row in rows],
+               tags=[row[3] for row in rows], heads=heads, deps=[row[5] if row[4] != 0 else "ROOT" for row in rows])
+
+
+def measure(run, repeat, setup=None):
+    # runs `run` (on the result of `setup`, which is not timed) `repeat` times, returns the best and the mean time
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        run(arg) if setup else run()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def corpus_parsed(text):
+    parsed, _ = parse_conllu(text)
+    return [[tok for tok in sentence if tok.get_conllu_field("id").major != 0] for sentence in parsed]
+
+
+def convert_parsed(text, compiled):
+    parsed, comments = parse_conllu(text)
+    converted, _ = Convert(parsed, True, True, True, math.inf, False, False, False, False, False, None, 1, None, compiled)()
+    return converted, comments
+
+
+def run_suite(lengths, sentences_count, repeat, seed):
+    rng = random.Random(seed)
+    compiled = compile_conversions()
+    results = []
+
+    def record(case, length, sentences, best, mean, **extra):
+        tokens = sum(len(sentence) for sentence in sentences) if sentences else 0
+        results.append(dict(case=case, length=length, sentences=len(sentences) if sentences else 0, tokens=tokens,
+                            repeat=repeat, best_seconds=best, mean_seconds=mean,
+                            sentences_per_second=len(sentences) / best if sentences and best else None,
+                            tokens_per_second=tokens / best if sentences and best else None, **extra))
+
+    # the length independent cases
+    record("compile_conversions", None, None, *measure(compile_conversions, repeat))
+    for conv_name, conversion in compiled.conversions.items():
+        record(f"matcher_construction/{conv_name}", None, None,
+               *measure(lambda: Matcher([NamedConstraint(conv_name, conversion.constraint)]), repeat))
+    matchers = {conv_name: Matcher([NamedConstraint(conv_name, conversion.constraint)])
+                for conv_name, conversion in compiled.conversions.items()}
+
+    for length in lengths:
+        sentences = [make_sentence(length, rng) for _ in range(sentences_count)]
+        text = to_conllu(sentences)
+        spike_sentences = [to_spike(rows) for rows in sentences]
+        odin_doc = to_odin(sentences)
+
+        record("parse_conllu", length, sentences, *measure(lambda: parse_conllu(text), repeat))
+        record("parse_odin", length, sentences, *measure(lambda: parse_odin(odin_doc), repeat))
+        record("parse_spike_sentence", length, sentences,
+               *measure(lambda: [parse_spike_sentence(spike_sentence) for spike_sentence in spike_sentences], repeat))
+
+        def match_all(parsed, matcher):
+            for sentence in parsed:
+                m = matcher(sentence)
+                for name in m.names():
+                    for _ in m.matches_for(name):
+                        pass
+
+        parsed = corpus_parsed(text)
+        for conv_name, matcher in matchers.items():
+            record(f"matching/{conv_name}", length, sentences, *measure(lambda: match_all(parsed, matcher), repeat))
+
+        iterations = []
+
+        def convert_sentences(parsed):
+            # as in Convert.convert, but keeping the iterations of each sentence
+            con = Convert(parsed, True, True, True, math.inf, False, False, False, False, False, None, 1, None, compiled)
+            iterations.clear()
+            for sentence in parsed:
+                assign_ccs_to_conjs(sentence, con.cc_assignments)
+                iterations.append(con.convert_sentence(sentence, compiled.conversions, math.inf, compiled.matcher))
+
+        record("convert_sentence", length, sentences, *measure(convert_sentences, repeat, lambda: corpus_parsed(text)),
+               iterations_mean=sum(iterations) / len(iterations), iterations_max=max(iterations))
+
+        converted, comments = convert_parsed(text, compiled)
+        record("serialize_conllu", length, sentences,
+               *measure(lambda: serialize_conllu(converted, comments, False, False), repeat))
+
+        try:
+            from pybart.spacy_wrapper import enhance_to_spacy_doc
+        except ImportError:
+            pass
+        else:
+            record("spacy_graphs", length, sentences, *measure(
+                lambda doc: enhance_to_spacy_doc(doc, converted, False, False), repeat, lambda: to_spacy_doc(sentences)))
+
+        record("convert_bart_conllu", length, sentences,
+               *measure(lambda: convert_bart_conllu(text, compiled_conversions=compiled), repeat))
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    # the cases (by case and length) whose best time grew by more than the tolerance (a fraction) over the baseline
+    baseline_times = {(result["case"], result["length"]): result["best_seconds"] for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = baseline_times.get((result["case"], result["length"]))
+        if base and result["best_seconds"] > base * (1 + tolerance):
+            regressions.append((result["case"], result["length"], base, result["best_seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--sentences", type=int, default=200, help="sentences per corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="where to write the JSON results (stdout by default)")
+    parser.add_argument("--baseline", help="a previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline, as a fraction")
+    args = parser.parse_args()
+    if min(args.lengths) < 4:
+        parser.error("the sentence lengths must be at least 4")
+
+    report = {
+        "meta": {"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "lengths": args.lengths, "sentences": args.sentences, "repeat": args.repeat, "seed": args.seed},
+        "results": run_suite(args.lengths, args.sentences, args.repeat, args.seed),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report["results"], json.load(f), args.tolerance)
+        for case, length, base, best in regressions:
+            print(f"regression: {case} (length={length}) {base:.4f}s -> {best:.4f}s", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
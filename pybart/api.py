@@ -1,93 +1,227 @@
+import importlib.util
 import math
+from itertools import islice
 
-from .conllu_wrapper import parse_conllu, serialize_conllu, parse_odin, conllu_to_odin, parse_spike_sentence, fix_spike_graph, parsed_tacred_json
-from .converter import Convert, get_conversion_names as inner_get_conversion_names, init_conversions
-from spacy.language import Language
-from .spacy_wrapper import parse_spacy_sent, enhance_to_spacy_doc
+from .conllu_wrapper import parse_conllu, serialize_conllu, iter_parse_conllu, write_conllu, parse_odin, conllu_to_odin, parse_spike_sentence, fix_spike_graph, parsed_tacred_json
+from .converter import Convert, get_conversion_names as inner_get_conversion_names, init_conversions, compile_conversions as inner_compile_conversions
 
 
-def convert_bart_conllu(conllu_text, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, preserve_comments=False, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1):
+def convert_bart_conllu(conllu_text, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, preserve_comments=False, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, compiled_conversions=None, eud_language=None, stats=None, cache=None):
     parsed, all_comments = parse_conllu(conllu_text)
-    con = Convert(parsed, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+    con = Convert(parsed, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, None, compiled_conversions, eud_language, stats, cache)
     converted, _ = con()
-    return serialize_conllu(converted, all_comments, remove_eud_info, remove_extra_info, preserve_comments)
+    return serialize_conllu(converted, all_comments, remove_eud_info, remove_extra_info, preserve_comments, eud_language)
 
 
-def _convert_bart_odin_sent(doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version):
-    sents = parse_odin(doc)
-    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
-    converted_sents, _ = con()
-    return conllu_to_odin(converted_sents, doc, remove_eud_info, remove_extra_info)
+def iter_convert_bart_conllu(conllu_lines, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, compiled_conversions=None, eud_language=None, stats=None, cache=None):
+    # lazily reads and converts one sentence at a time, yielding (converted sentence, comments) pairs,
+    #   so the memory doesn't grow with the size of the corpus
+    if compiled_conversions is None:
+        compiled_conversions = inner_compile_conversions(enhance_ud, enhanced_plus_plus, enhanced_extra, remove_eud_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+    # one converter for the entire stream, as the alternatives (iids) are numbered along it
+    con = Convert([], enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, None, compiled_conversions, eud_language, stats, cache)
+    for sentence, comments in iter_parse_conllu(conllu_lines):
+        converted, _ = con.convert_more([sentence])
+        yield converted[0], comments
+
 
+def convert_bart_conllu_stream(conllu_lines, output, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, preserve_comments=False, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, compiled_conversions=None, eud_language=None, stats=None, cache=None):
+    # the streaming version of convert_bart_conllu: reads the lines (e.g. an open file) and writes to the output stream
+    #   as it goes, the same text convert_bart_conllu would have returned. returns the number of converted sentences.
+    converted = iter_convert_bart_conllu(conllu_lines, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions, eud_language, stats, cache)
+    return write_conllu(output, converted, remove_eud_info, remove_extra_info, preserve_comments, eud_language)
 
-def convert_bart_odin(odin_json, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1):
+
+def _convert_bart_odin_sent(doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions=None, eud_language=None):
+    sents = parse_odin(doc)
+    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, None, compiled_conversions, eud_language)
+    converted_sents, _ = con()
+    return conllu_to_odin(converted_sents, doc, remove_eud_info, remove_extra_info, eud_language=eud_language)
+
+
+def convert_bart_odin(odin_json, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, compiled_conversions=None, n_process=1, eud_language=None):
+    if n_process > 1 and "documents" in odin_json:
+        # convert the documents concurrently, each worker process initializes the conversions once
+        from .parallel import ParallelConverter
+        with ParallelConverter(n_process, 1, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version) as parallel_converter:
+            doc_keys = list(odin_json["documents"].keys())
+            converted_docs = parallel_converter.iter_convert_odin_documents((odin_json["documents"][doc_key] for doc_key in doc_keys), eud_language)
+            for doc_key, converted_doc in zip(doc_keys, converted_docs):
+                odin_json["documents"][doc_key] = converted_doc
+        return odin_json
+
+    if compiled_conversions is None:
+        # compile once for all the documents
+        compiled_conversions = inner_compile_conversions(enhance_ud, enhanced_plus_plus, enhanced_extra, remove_eud_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
     if "documents" in odin_json:
         for doc_key, doc in odin_json["documents"].items():
-            odin_json["documents"][doc_key] = _convert_bart_odin_sent(doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+            odin_json["documents"][doc_key] = _convert_bart_odin_sent(doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions, eud_language)
     else:
-        odin_json = _convert_bart_odin_sent(odin_json, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+        odin_json = _convert_bart_odin_sent(odin_json, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions, eud_language)
 
     return odin_json
 
 
-def _inner_convert_spike_sentence(spike_sentence, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version):
+def convert_bart_odin_jsonl(odin_lines, output, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, n_process=1, chunk_size=1, eud_language=None):
+    # the streaming version of convert_bart_odin: reads a JSON-lines input (e.g. an open file) with an Odin json per line,
+    #   and writes the converted jsons, one per line and in the same order, to the output stream.
+    #   only a bounded number of lines is held in memory at once. returns the number of converted lines.
+    from .parallel import ParallelConverter
+    count = 0
+    with ParallelConverter(n_process, chunk_size, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version) as parallel_converter:
+        for converted_line in parallel_converter.iter_convert_odin_jsonl(odin_lines, eud_language):
+            output.write(converted_line + "\n")
+            count += 1
+    return count
+
+
+def _inner_convert_spike_sentence(spike_sentence, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions=None, eud_language=None, stats=None, cache=None):
     sents = [parse_spike_sentence(spike_sentence)]
-    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, None, compiled_conversions, eud_language, stats, cache)
     return con()
 
 
-def convert_spike_sentence(spike_sentence, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, graph_to_replace="universal-enhanced"):
-    converted_sents, _ = _inner_convert_spike_sentence(spike_sentence, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+def convert_spike_sentence(spike_sentence, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, graph_to_replace="universal-enhanced", compiled_conversions=None, eud_language=None):
+    converted_sents, _ = _inner_convert_spike_sentence(spike_sentence, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions, eud_language)
     # ATTENTION - overrides original json
-    return fix_spike_graph(converted_sents[0], spike_sentence, remove_eud_info, remove_extra_info, graph_to_replace)
+    return fix_spike_graph(converted_sents[0], spike_sentence, remove_eud_info, remove_extra_info, graph_to_replace, eud_language=eud_language)
+
 
+def convert_spike_sentences(spike_sentences, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, graph_to_replace="universal-enhanced", compiled_conversions=None, in_place=False, eud_language=None):
+    # lazily converts many SPIKE sentences with conversions that are compiled once, yielding each updated sentence.
+    #   with in_place, an existing graph_to_replace section is overwritten, reusing its lists and edge dicts.
+    if compiled_conversions is None:
+        compiled_conversions = inner_compile_conversions(enhance_ud, enhanced_plus_plus, enhanced_extra, remove_eud_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+    for spike_sentence in spike_sentences:
+        converted_sents, _ = _inner_convert_spike_sentence(spike_sentence, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, compiled_conversions, eud_language)
+        # ATTENTION - overrides original json
+        yield fix_spike_graph(converted_sents[0], spike_sentence, remove_eud_info, remove_extra_info, graph_to_replace, in_place, eud_language)
 
-def convert_bart_tacred(tacred_json, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1):
+
+def convert_bart_tacred(tacred_json, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, compiled_conversions=None):
     sents = parsed_tacred_json(tacred_json)
-    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+    con = Convert(sents, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, None, compiled_conversions)
     converted_sents, _ = con()
 
     return converted_sents
 
 
-def convert_spacy_doc(doc, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, one_time_initialized_conversions=None):
+def convert_spacy_doc(doc, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, one_time_initialized_conversions=None, compiled_conversions=None, eud_language=None, stats=None, cache=None):
+    from .spacy_wrapper import parse_spacy_sent, enhance_to_spacy_doc
     parsed_doc = [parse_spacy_sent(sent) for sent in doc.sents]
-    con = Convert(parsed_doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, one_time_initialized_conversions)
+    con = Convert(parsed_doc, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, one_time_initialized_conversions, compiled_conversions, eud_language, stats, cache)
     converted, convs_done = con()
-    enhance_to_spacy_doc(doc, converted, remove_eud_info, remove_extra_info)
+    enhance_to_spacy_doc(doc, converted, remove_eud_info, remove_extra_info, eud_language)
     return converted, convs_done
 
 
 class Converter:
-    def __init__(self, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, is_spike_converter=False):
+    def __init__(self, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, is_spike_converter=False, eud_language=None, n_process=1, stats=None, cache=None):
+        if stats is not None and n_process > 1:
+            raise ValueError("stats are collected in the calling process, so they can't be used with n_process > 1")
+        if cache is not None and n_process > 1:
+            raise ValueError("the cache is used in the calling process, so it can't be used with n_process > 1")
         self.config = (enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
         self.is_spike_converter = is_spike_converter
-        # make conversions and (more importantly) constraint initialization, a one timer.
+        # the language of the allow-list of euds that may appear literally in the labels (None allows all the languages)
+        self.eud_language = eud_language
+        # the default number of processes that pipe converts with
+        self.n_process = n_process
+        # the optional instrumentation of the conversions (see stats.ConversionStats)
+        self.stats = stats
+        # the optional cache of converted sentences (see cache.ConversionCache)
+        self.cache = cache
+        self._parallel_converter = None
+        # make conversions and (more importantly) constraint initialization and matcher compilation, a one timer.
         self.conversions = init_conversions(remove_node_adding_conversions, ud_version)
+        self.compiled_conversions = inner_compile_conversions(enhance_ud, enhanced_plus_plus, enhanced_extra, remove_eud_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, self.conversions)
 
     def __call__(self, doc):
         if self.is_spike_converter:
-            converted_sents, convs_done = _inner_convert_spike_sentence(doc, *self.config)
+            converted_sents, convs_done = _inner_convert_spike_sentence(doc, *self.config, self.compiled_conversions, self.eud_language, self.stats, self.cache)
         else:
-            converted_sents, convs_done = convert_spacy_doc(doc, *self.config, self.conversions)
+            converted_sents, convs_done = convert_spacy_doc(doc, *self.config, self.conversions, self.compiled_conversions, self.eud_language, self.stats, self.cache)
+            self._store_results(doc, converted_sents, convs_done)
         self._converted_sents = converted_sents
         self._convs_done = convs_done
         return doc
 
+    @staticmethod
+    def _store_results(doc, converted_sents, convs_done):
+        doc._.pybart_converted_sents = converted_sents
+        doc._.pybart_max_convs = convs_done
+
+    def pipe(self, docs, batch_size=128, n_process=None):
+        # spaCy's batched protocol (nlp.pipe). the results are stored per doc (doc._.pybart_converted_sents and
+        #   doc._.pybart_max_convs), and the graphs of a doc are built in one batch.
+        #   with n_process > 1 the docs are converted over a pool of worker processes, and then only the graphs
+        #   come back (the converted sentences stay in the workers, so pybart_converted_sents is None).
+        if self.is_spike_converter:
+            yield from (self(doc) for doc in docs)
+            return
+        n_process = self.n_process if n_process is None else n_process
+        if n_process > 1 and self.stats is not None:
+            raise ValueError("stats are collected in the calling process, so they can't be used with n_process > 1")
+        if n_process > 1 and self.cache is not None:
+            raise ValueError("the cache is used in the calling process, so it can't be used with n_process > 1")
+        if n_process <= 1:
+            yield from (self(doc) for doc in docs)
+            return
+
+        from .spacy_wrapper import spacy_doc_payload, attach_graphs
+        from .parallel import ParallelConverter
+        if self._parallel_converter is None or self._parallel_converter.workers != n_process:
+            self.close()
+            self._parallel_converter = ParallelConverter(n_process, 16, *self.config)
+        docs = iter(docs)
+        batch = list(islice(docs, batch_size))
+        while batch:
+            results = self._parallel_converter.iter_convert_spacy_docs([spacy_doc_payload(doc) for doc in batch], self.eud_language)
+            for doc, (graphs_args, convs_done) in zip(batch, results):
+                attach_graphs(doc, graphs_args)
+                self._store_results(doc, None, convs_done)
+                self._converted_sents, self._convs_done = None, convs_done
+                yield doc
+            batch = list(islice(docs, batch_size))
+
+    def close(self):
+        # shuts down the worker processes of pipe, if any
+        if self._parallel_converter is not None:
+            self._parallel_converter.close()
+            self._parallel_converter = None
+
     def get_converted_sents(self):
         return self._converted_sents
 
     def get_max_convs(self):
         return self._convs_done
 
+    def get_compiled_conversions(self):
+        return self.compiled_conversions
+
 
 def get_conversion_names():
     return inner_get_conversion_names()
 
 
-@Language.factory(
-   "pybart_spacy_pipe",
-   default_config={"enhance_ud": True, "enhanced_plus_plus": True, "enhanced_extra": True, "conv_iterations": math.inf, "remove_eud_info": False, "remove_extra_info": False, "remove_node_adding_conversions": False, "remove_unc": False, "query_mode": False, "funcs_to_cancel": None, "ud_version": 1},
-)
-def create_pybart_spacy_pipe(nlp, name, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version):
-    return Converter(enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+def compile_conversions(enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, remove_eud_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1):
+    # the result can be passed as `compiled_conversions` to any of the convert functions (with the same configuration)
+    return inner_compile_conversions(enhance_ud, enhanced_plus_plus, enhanced_extra, remove_eud_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+
+
+# spaCy is imported only by the spaCy calls, so the other formats can be converted without paying for its import.
+#   the pipeline component factory is registered when it is looked up here (as in `from pybart.api import *`),
+#   or by spaCy itself through the package's "spacy_factories" entry point.
+def __getattr__(name):
+    if name == "create_pybart_spacy_pipe":
+        from .spacy_wrapper import create_pybart_spacy_pipe
+        return create_pybart_spacy_pipe
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["convert_bart_conllu", "iter_convert_bart_conllu", "convert_bart_conllu_stream", "convert_bart_odin", "convert_bart_odin_jsonl",
+           "convert_spike_sentence", "convert_spike_sentences", "convert_bart_tacred", "convert_spacy_doc", "Converter", "get_conversion_names",
+           "compile_conversions"]
+# looked up by `from pybart.api import *` only when spaCy is installed (find_spec doesn't import it)
+if importlib.util.find_spec("spacy") is not None:
+    __all__.append("create_pybart_spacy_pipe")
@@ -0,0 +1,279 @@
+"""A compact binary format for converted sentence graphs, with a memory-mapped reader that has random access.
+
+Layout (all the integers are little endian):
+    header      8 bytes magic, uint32 format version, uint32 reserved
+    sentences   a block of int32 values per sentence (see BinaryWriter.write)
+    strings     int64 count, int64 offsets (count + 1) into the UTF-8 blob that follows
+    labels      int64 count, int32 rows of the Label fields (string ids, -1 for None)
+    index       int64 offset of each sentence block
+    footer      int64 offsets of the strings, labels and index sections, int64 sentence count, 8 bytes magic
+
+The strings (the token fields and the label parts) and the labels are interned into tables, so a sentence block
+holds only integers. The reader maps the file and reads only the blocks (and table entries) it is asked for.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .graph_token import CompactSentence, Label
+
+MAGIC = b"PYBARTG\x00"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_FOOTER = struct.Struct("<qqqq8s")
+# the fields of a Label row, in the order of the Label arguments
+_LABEL_FIELDS = 7
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _to_bytes(values, typecode):
+    values = array(typecode, values)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def _view(buffer, typecode):
+    # a zero copy view of the integers (a copy on big endian machines)
+    if _LITTLE_ENDIAN:
+        return memoryview(buffer).cast(typecode)
+    values = array(typecode, bytes(buffer))
+    values.byteswap()
+    return memoryview(values)
+
+
+class BinaryWriter:
+    """Writes converted sentences (Token lists, as returned by the conversion, or CompactSentences) to a binary file.
+
+    Use it as a context manager (or call close), as the tables and the index are written at the end.
+    """
+    def __init__(self, file):
+        self._owns_file = isinstance(file, (str, os.PathLike))
+        self._file = open(file, "wb") if self._owns_file else file
+        self._strings = dict()
+        self._labels = dict()
+        self._label_rows = array('i')
+        self._offsets = array('q')
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+        self._position = _HEADER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _string_id(self, string):
+        if string is None:
+            return -1
+        string_id = self._strings.get(string)
+        if string_id is None:
+            string_id = self._strings[string] = len(self._strings)
+        return string_id
+
+    def _label_id(self, label_args):
+        key = tuple(label_args)
+        label_id = self._labels.get(key)
+        if label_id is None:
+            label_id = self._labels[key] = len(self._labels)
+            base, eud, src, src_type, phrase, uncertain, iid = key
+            self._label_rows.extend([self._string_id(base), self._string_id(eud), self._string_id(src),
+                                     self._string_id(src_type), self._string_id(phrase), int(uncertain),
+                                     -1 if iid is None else iid])
+        return label_id
+
+    def write(self, sentence):
+        # the block: the token count, the edge count and the children count, the token id and head columns
+        #   (a head that is a placeholder string rather than a TokenId has its string id in the last of them),
+        #   the string columns (CompactSentence.string_fields), the edges (child, head and label columns, the root is -1),
+        #   and the children of each token (and of the root) with their offsets.
+        state = (sentence if isinstance(sentence, CompactSentence) else CompactSentence(sentence)).to_state()
+        token_count = len(state["id_majors"])
+        label_ids = [self._label_id(label_args) for label_args in state["labels"]]
+        other_heads = [-1] * token_count
+        for i, head in state["other_heads"].items():
+            other_heads[int(i)] = self._string_id(head)
+        block = array('i', [token_count, len(state["edge_children"]), len(state["children"])])
+        for name in ("id_majors", "id_minors", "head_majors", "head_minors"):
+            block.extend(state[name])
+        block.extend(other_heads)
+        for column in state["columns"]:
+            block.extend(self._string_id(value) for value in column)
+        block.extend(state["edge_children"])
+        block.extend(state["edge_heads"])
+        block.extend(label_ids[i] for i in state["edge_labels"])
+        block.extend(state["children"])
+        block.extend(state["children_offsets"])
+        if not _LITTLE_ENDIAN:
+            block.byteswap()
+        self._offsets.append(self._position)
+        self._file.write(block.tobytes())
+        self._position += len(block) * block.itemsize
+
+    def close(self):
+        if self._file is None:
+            return
+        strings_offset = self._position
+        encoded = [string.encode("utf-8") for string in self._strings]
+        string_offsets = [0]
+        for string in encoded:
+            string_offsets.append(string_offsets[-1] + len(string))
+        blob = b"".join(encoded)
+        # pad the blob, so the next sections stay aligned
+        blob += b"\0" * (-len(blob) % 8)
+        self._file.write(_to_bytes([len(encoded)] + string_offsets, 'q') + blob)
+        labels_offset = strings_offset + 8 * (len(string_offsets) + 1) + len(blob)
+        self._file.write(_to_bytes([len(self._labels)], 'q') + _to_bytes(self._label_rows, 'i'))
+        index_offset = labels_offset + 8 + 4 * len(self._label_rows)
+        padding = -index_offset % 8
+        self._file.write(b"\0" * padding + _to_bytes(self._offsets, 'q'))
+        index_offset += padding
+        self._file.write(_FOOTER.pack(strings_offset, labels_offset, index_offset, len(self._offsets), MAGIC))
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+
+
+def write_binary(file, sentences):
+    # writes all the sentences, returns their number
+    with BinaryWriter(file) as writer:
+        for sentence in sentences:
+            writer.write(sentence)
+        return len(writer)
+
+
+class BinarySentence:
+    """A sentence of a BinaryReader. The integer columns are zero copy views of the mapped file."""
+    def __init__(self, reader, block):
+        self.reader = reader
+        token_count, edge_count, children_count = block[0], block[1], block[2]
+        position = 3
+
+        def take(size):
+            nonlocal position
+            position += size
+            return block[position - size:position]
+
+        self.id_majors = take(token_count)
+        self.id_minors = take(token_count)
+        self.head_majors = take(token_count)
+        self.head_minors = take(token_count)
+        self.other_heads = take(token_count)
+        self.columns = [take(token_count) for _ in CompactSentence.string_fields]
+        self.edge_children = take(edge_count)
+        self.edge_heads = take(edge_count)
+        self.edge_labels = take(edge_count)
+        self.children = take(children_count)
+        self.children_offsets = take(token_count + 2)
+
+    def __len__(self):
+        return len(self.id_majors)
+
+    def field(self, field_name):
+        # the values of a string field (e.g. "form") of all the tokens
+        return [self.reader.string(string_id) for string_id in self.columns[CompactSentence.string_fields.index(field_name)]]
+
+    def edges(self):
+        # the (child index, head index, Label) of each edge, the root is -1
+        return [(child, head, self.reader.label(label_id))
+                for child, head, label_id in zip(self.edge_children, self.edge_heads, self.edge_labels)]
+
+    def to_compact(self):
+        labels = list(dict.fromkeys(self.edge_labels))
+        local_ids = {label_id: i for i, label_id in enumerate(labels)}
+        return CompactSentence.from_state({
+            "id_majors": self.id_majors, "id_minors": self.id_minors,
+            "head_majors": self.head_majors, "head_minors": self.head_minors,
+            "other_heads": {str(i): self.reader.string(string_id) for i, string_id in enumerate(self.other_heads) if string_id != -1},
+            "columns": [[self.reader.string(string_id) for string_id in column] for column in self.columns],
+            "edge_children": self.edge_children, "edge_heads": self.edge_heads,
+            "edge_labels": [local_ids[label_id] for label_id in self.edge_labels],
+            "labels": [self.reader.label(label_id).__reduce__()[1] for label_id in labels],
+            "children": self.children, "children_offsets": self.children_offsets,
+        })
+
+    def to_tokens(self):
+        # the Token graph of the sentence (as serialize_conllu and the other output functions take)
+        return self.to_compact().to_tokens()
+
+
+class BinaryReader:
+    """Reads a file of BinaryWriter by mapping it into memory: reader[n] reads only the n-th sentence.
+
+    Use it as a context manager (or call close) to unmap the file, once its sentences are no longer referenced
+    (their columns are views of the map).
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a pybart binary file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported pybart binary format version {version}, expected {FORMAT_VERSION}")
+        strings_offset, labels_offset, index_offset, count, magic = _FOOTER.unpack_from(self._mmap, len(self._mmap) - _FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        buffer = memoryview(self._mmap)
+        self._index = _view(buffer[index_offset:index_offset + 8 * count], 'q')
+        string_count = struct.unpack_from("<q", self._mmap, strings_offset)[0]
+        self._string_offsets = _view(buffer[strings_offset + 8:strings_offset + 8 * (string_count + 2)], 'q')
+        self._string_blob = strings_offset + 8 * (string_count + 2)
+        label_count = struct.unpack_from("<q", self._mmap, labels_offset)[0]
+        self._label_rows = _view(buffer[labels_offset + 8:labels_offset + 8 + 4 * _LABEL_FIELDS * label_count], 'i')
+        self._sentences_end = strings_offset
+        self._strings = dict()
+        self._labels = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # drop the views before unmapping, as the map can't be closed while they are alive
+        self._index = self._string_offsets = self._label_rows = None
+        self._strings.clear()
+        self._labels.clear()
+        self._mmap.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError("sentence index out of range")
+        start = self._index[n]
+        end = self._index[n + 1] if n + 1 < len(self) else self._sentences_end
+        return BinarySentence(self, _view(memoryview(self._mmap)[start:end], 'i'))
+
+    def __iter__(self):
+        return (self[n] for n in range(len(self)))
+
+    def string(self, string_id):
+        if string_id == -1:
+            return None
+        string = self._strings.get(string_id)
+        if string is None:
+            start = self._string_blob + self._string_offsets[string_id]
+            end = self._string_blob + self._string_offsets[string_id + 1]
+            string = self._strings[string_id] = sys.intern(self._mmap[start:end].decode("utf-8"))
+        return string
+
+    def label(self, label_id):
+        label = self._labels.get(label_id)
+        if label is None:
+            row = self._label_rows[label_id * _LABEL_FIELDS:(label_id + 1) * _LABEL_FIELDS]
+            base, eud, src, src_type, phrase, uncertain, iid = row
+            label = self._labels[label_id] = Label(
+                self.string(base), self.string(eud), self.string(src), self.string(src_type), self.string(phrase),
+                bool(uncertain), None if iid == -1 else iid)
+        return label
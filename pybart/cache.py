@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from typing import NamedTuple
+
+from .graph_token import CompactSentence, CONLLU_FIELDS
+
+# part of every key, bump it when the conversions change their output (so stored results of older versions are missed)
+CACHE_FORMAT_VERSION = 1
+
+
+class CachedSentence(NamedTuple):
+    # the CompactSentence state (see CompactSentence.to_state) of the converted sentence. the alternative ids (iid)
+    #   of the labels are relative to the first one the sentence assigned, as they are numbered along a document.
+    state: dict
+    iterations: int
+    new_iids: int
+
+
+def sentence_key(sentence, config):
+    # a digest of the sentence as it is before the conversion (its fields and edges) and of the configuration
+    index = {token: i for i, token in enumerate(sentence)}
+    digest = hashlib.blake2b(repr((CACHE_FORMAT_VERSION, config)).encode(), digest_size=20)
+    for token in sentence:
+        fields = "\t".join("_" if value is None else str(value) for value in (token.get_conllu_field(field_name) for field_name in CONLLU_FIELDS))
+        edges = [(index.get(head, -1), rel.__reduce__()[1]) for head, rels in token.get_new_relations() for rel in rels]
+        digest.update(f"{fields}\t{edges}\n".encode())
+    return digest.hexdigest()
+
+
+def _shift_iids(state, delta):
+    labels = [label[:6] + [label[6] + delta] if label[6] is not None else label for label in state["labels"]]
+    return {**state, "labels": labels}
+
+
+class ConversionCache:
+    """A content-addressed cache of converted sentences, for corpora that repeat sentences.
+
+    Pass an instance to the convert calls (or to Convert, as its cache argument). A sentence is looked up by a digest of
+    its basic tree (all of its fields and edges) and of the conversion configuration, and on a hit its converted
+    graph is restored without running the conversions.
+    At most max_size sentences are kept in memory (the least recently used are evicted). Given a path, the sentences are
+    stored in an SQLite file as well, so they outlive the process (call close, or use it as a context manager,
+    to commit them).
+    """
+    # the number of stored sentences between commits of the SQLite file
+    commit_every = 1000
+
+    def __init__(self, max_size=10000, path=None):
+        if max_size < 0:
+            raise ValueError("max_size can't be negative")
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._db = None
+        self._uncommitted = 0
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS sentences (key TEXT PRIMARY KEY, value TEXT)")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def clear(self):
+        self._entries.clear()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if self._db is not None:
+            row = self._db.execute("SELECT value FROM sentences WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = CachedSentence(*json.loads(row[0]))
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO sentences VALUES (?, ?)", (key, json.dumps(entry)))
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def restore(self, key, next_iid):
+        # returns the converted sentence, its number of iterations and the number of alternatives (iids) it numbered,
+        #   or None on a miss. next_iid is the converter's next free alternative id, which the sentence's ids start from.
+        entry = self.get(key)
+        if entry is None:
+            return None
+        tokens = CompactSentence.from_state(_shift_iids(entry.state, next_iid)).to_tokens()
+        return tokens, entry.iterations, entry.new_iids
+
+    def store(self, key, converted_sentence, iterations, iids_before, iids_after):
+        state = _shift_iids(CompactSentence(converted_sentence).to_state(), -iids_before)
+        self.put(key, CachedSentence(state, iterations, iids_after - iids_before))
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._entries), "hit_rate": self.hits / lookups if lookups else 0.0}
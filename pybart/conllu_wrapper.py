@@ -2,6 +2,49 @@ import uuid
 from .graph_token import Token, add_basic_edges, TokenId
 
 
+def _parse_conllu_sentence(sent):
+    # parses the text of a single sentence, and returns its tokens (with a root) and comments
+    lines = sent.strip().split('\n')
+    comments = []
+    sentence = []
+    
+    # for each line (either comment or token)
+    for line in lines:
+        # store comments
+        if line.startswith('#'):
+            comments.append(line)
+            continue
+        
+        # split line by any whitespace, and store the first 10 columns.
+        parts = line.split()
+        if len(parts) > 10:
+            parts = line.split("\t")
+            if len(parts) > 10:
+                raise ValueError("text must be a basic CoNLL-U format, received too many columns or separators.")
+        
+        new_id, form, lemma, upos, xpos, feats, head, deprel, deps, misc = parts[:10]
+        
+        # validate input
+        if '-' in new_id:
+            raise ValueError("text must be a basic CoNLL-U format, received a CoNLL-X format.")
+        if deps != '_' or '.' in new_id:
+            raise ValueError("text must be a basic CoNLL-U, received an enhanced one.")
+        
+        # fix xpos if empty to a copy of upos
+        xpos = upos if xpos == '_' else xpos
+        
+        # add current token to current sentence
+        sentence.append(Token(
+                TokenId(int(new_id)), form, lemma, upos, xpos, feats, TokenId(int(head)), deprel, deps, misc))
+    
+    # add root
+    sentence.append(Token(TokenId(0), None, None, None, None, None, None, None, None, None))
+    
+    # after parsing entire sentence, add basic deprel edges
+    add_basic_edges(sentence)
+    return sentence, comments
+
+
 def parse_conllu(text):
     """Purpose: parses the given CoNLL-U formatted text.
     
@@ -22,54 +65,52 @@ def parse_conllu(text):
     
     # for each sentence
     for sent in text.strip().split('\n\n'):
-        lines = sent.strip().split('\n')
-        if not lines:
-            continue
-        comments = []
-        sentence = []
-        
-        # for each line (either comment or token)
-        for line in lines:
-            # store comments
-            if line.startswith('#'):
-                comments.append(line)
-                continue
-            
-            # split line by any whitespace, and store the first 10 columns.
-            parts = line.split()
-            if len(parts) > 10:
-                parts = line.split("\t")
-                if len(parts) > 10:
-                    raise ValueError("text must be a basic CoNLL-U format, received too many columns or separators.")
-            
-            new_id, form, lemma, upos, xpos, feats, head, deprel, deps, misc = parts[:10]
-            
-            # validate input
-            if '-' in new_id:
-                raise ValueError("text must be a basic CoNLL-U format, received a CoNLL-X format.")
-            if deps != '_' or '.' in new_id:
-                raise ValueError("text must be a basic CoNLL-U, received an enhanced one.")
-            
-            # fix xpos if empty to a copy of upos
-            xpos = upos if xpos == '_' else xpos
-            
-            # add current token to current sentence
-            sentence.append(Token(
-                    TokenId(int(new_id)), form, lemma, upos, xpos, feats, TokenId(int(head)), deprel, deps, misc))
-        
-        # add root
-        sentence.append(Token(TokenId(0), None, None, None, None, None, None, None, None, None))
-        
-        # after parsing entire sentence, add basic deprel edges,
-        # and add sentence to output list
-        add_basic_edges(sentence)
+        sentence, comments = _parse_conllu_sentence(sent)
         sentences.append(sentence)
         all_comments.append(comments)
     
     return sentences, all_comments
 
 
-def serialize_conllu(converted, all_comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments=False):
+def iter_parse_conllu(lines):
+    """Purpose: lazily parses CoNLL-U formatted lines, one sentence at a time.
+    
+    Args:
+        (iterable(str)) The lines, e.g. an open file. A sentence is read only once the previous one was consumed.
+    
+    returns:
+        (generator(tuple(list(Token), list(str)))) yields a (sentence, comments list) pair per sentence.
+    
+     Raises:
+         the same as parse_conllu.
+    """
+    for sent in iter_conllu_blocks(lines):
+        yield _parse_conllu_sentence(sent)
+
+
+def iter_conllu_blocks(lines):
+    # lazily groups the lines into the (unparsed) text of each sentence.
+    #   joining the texts with blank lines gives a text parse_conllu would parse to the same sentences.
+    block = []
+    for line in lines:
+        # sentences are separated by blank lines
+        if line.strip():
+            block.append(line.rstrip('\r\n'))
+        elif block:
+            yield '\n'.join(block)
+            block = []
+    if block:
+        yield '\n'.join(block)
+
+
+def serialize_conllu_sentence(sentence, comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments=False, eud_language=None):
+    # the text of a single sentence in the CoNLL-U format (with a trailing new line)
+    lines = ["\n".join(comments)] if preserve_comments else []
+    lines += [token.get_conllu_string(remove_enhanced_extra_info, remove_bart_extra_info, eud_language) for token in sorted(sentence, key=lambda tok: tok.get_conllu_field("id")) if token.get_conllu_field("id").major != 0]
+    return "\n".join(lines) + "\n"
+
+
+def serialize_conllu(converted, all_comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments=False, eud_language=None):
     """Purpose: create a CoNLL-U formatted text from a sentence list.
     
     Args:
@@ -78,16 +119,27 @@ def serialize_conllu(converted, all_comments, remove_enhanced_extra_info, remove
     returns:
         (str) the text corresponding to the sentence list in the CoNLL-U format.
      """
-    text = []
-    comments = []
-    for (sentence, per_sent_comments) in zip(converted, all_comments):
-        # recover comments from original file
-        if preserve_comments:
-            comments = ["\n".join(per_sent_comments)]
-        
-        text.append(comments + [token.get_conllu_string(remove_enhanced_extra_info, remove_bart_extra_info) for token in sorted(sentence, key=lambda tok: tok.get_conllu_field("id")) if token.get_conllu_field("id").major != 0])
+    return "\n".join([serialize_conllu_sentence(sentence, per_sent_comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments, eud_language)
+                      for (sentence, per_sent_comments) in zip(converted, all_comments)])
+
+
+def write_conllu(output, converted_with_comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments=False, eud_language=None):
+    """Purpose: incrementally writes sentences to a stream in the CoNLL-U format.
+    
+    Args:
+        (file-like) The output stream.
+        (iterable(tuple(list(Token), list(str)))) (sentence, comments list) pairs, consumed one at a time.
     
-    return "\n".join(["\n".join(sent) + "\n" for sent in text])
+    returns:
+        (int) the number of written sentences. The written text is the same as serialize_conllu's.
+     """
+    count = 0
+    for sentence, per_sent_comments in converted_with_comments:
+        if count:
+            output.write("\n")
+        output.write(serialize_conllu_sentence(sentence, per_sent_comments, remove_enhanced_extra_info, remove_bart_extra_info, preserve_comments, eud_language))
+        count += 1
+    return count
 
 
 def parse_spike_sentence(spike_sentence):
@@ -108,12 +160,18 @@ def parse_spike_sentence(spike_sentence):
     return output
 
 
-def fix_spike_graph(conllu_sentence, spike_sentence, remove_enhanced_extra_info, remove_bart_extra_info, graph_to_replace):
+def fix_spike_graph(conllu_sentence, spike_sentence, remove_enhanced_extra_info, remove_bart_extra_info, graph_to_replace, in_place=False, eud_language=None):
     # ASSUMPTION - SPIKE doesnt allow node-adding conversions, so we dont need to fix text/offsets/etc
-    if 'graphs' in spike_sentence:
-        spike_sentence["graphs"][graph_to_replace] = {"edges": [], "roots": []}
-    else:
-        spike_sentence["graphs"] = {graph_to_replace: {"edges": [], "roots": []}}
+    if 'graphs' not in spike_sentence:
+        spike_sentence["graphs"] = dict()
+    # in place, an existing graph (and its edge dicts) is overwritten rather than replaced
+    graph = spike_sentence["graphs"].get(graph_to_replace) if in_place else None
+    if not graph or ("edges" not in graph) or ("roots" not in graph):
+        graph = spike_sentence["graphs"][graph_to_replace] = {"edges": [], "roots": []}
+    roots = graph["roots"]
+    edges = graph["edges"]
+    roots.clear()
+    edges_count = 0
 
     for iid, token in enumerate(conllu_sentence):
         if token.get_conllu_field("id").major == 0:
@@ -121,11 +179,22 @@ def fix_spike_graph(conllu_sentence, spike_sentence, remove_enhanced_extra_info,
         
         for head, rels in token.get_new_relations():
             for rel in rels:
-                if rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info).lower().startswith("root"):
-                    spike_sentence["graphs"][graph_to_replace]["roots"].append(iid)
+                label = rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language)
+                if label.lower().startswith("root"):
+                    roots.append(iid)
+                    continue
+                parent = head.get_conllu_field("id").major - 1
+                if edges_count < len(edges) and len(edges[edges_count]) == 3:
+                    edge = edges[edges_count]
+                    edge["parent"] = parent
+                    edge["child"] = iid
+                    edge["label"] = label
+                elif edges_count < len(edges):
+                    edges[edges_count] = {"parent": parent, "child": iid, "label": label}
                 else:
-                    spike_sentence["graphs"][graph_to_replace]["edges"].append(
-                        {"parent": head.get_conllu_field("id").major - 1, "child": iid, "label": rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info)})
+                    edges.append({"parent": parent, "child": iid, "label": label})
+                edges_count += 1
+    del edges[edges_count:]
     
     return spike_sentence
 
@@ -139,11 +208,11 @@ def parse_odin(odin_json):
         for i, (word, tag, lemma) in enumerate(zip(sent['words'], sent['tags'], sent['lemmas'])):
             sentence.append(Token(TokenId(i + 1), word, lemma, "_", tag, "_", None, "_", "_", "_"))
         for edge in sent['graphs']['universal-basic']['edges']:
-            sentence[edge['destination'] + 1].set_conllu_field('head', TokenId(edge['source'] + 1))
-            sentence[edge['destination'] + 1].set_conllu_field('deprel', edge['relation'])
+            sentence[edge['destination']].set_conllu_field('head', TokenId(edge['source'] + 1))
+            sentence[edge['destination']].set_conllu_field('deprel', edge['relation'])
         for root in sent['graphs']['universal-basic']['roots']:
-            sentence[root + 1].set_conllu_field('head', TokenId(0))
-            sentence[root + 1].set_conllu_field('deprel', "root")
+            sentence[root].set_conllu_field('head', TokenId(0))
+            sentence[root].set_conllu_field('deprel', "root")
         sentence.append(Token(TokenId(0), None, None, None, None, None, None, None, None, None))
 
         add_basic_edges(sentence)
@@ -193,7 +262,7 @@ def fix_sentence(conllu_sentence, push_new_to_end=True):
         return _fix_sentence_keep_order(conllu_sentence)
 
 
-def fix_odin_graph(conllu_sentence, odin_sentence, is_basic, remove_enhanced_extra_info, remove_bart_extra_info):
+def fix_odin_graph(conllu_sentence, odin_sentence, is_basic, remove_enhanced_extra_info, remove_bart_extra_info, eud_language=None):
     if is_basic:
         odin_sentence["graphs"] = {"universal-basic": {"edges": [], "roots": []}}
     else:
@@ -216,11 +285,11 @@ def fix_odin_graph(conllu_sentence, odin_sentence, is_basic, remove_enhanced_ext
         else:
             for head, rels in token.get_new_relations():
                 for rel in rels:
-                    if rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info).lower().startswith("root"):
+                    if rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language).lower().startswith("root"):
                         odin_sentence["graphs"]["universal-enhanced"]["roots"].append(iid)
                     else:
                         odin_sentence["graphs"]["universal-enhanced"]["edges"].append(
-                            {"source": head.get_conllu_field("id").major - 1, "destination": iid, "relation": rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info)})
+                            {"source": head.get_conllu_field("id").major - 1, "destination": iid, "relation": rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language)})
 
     return odin_sentence
 
@@ -261,7 +330,7 @@ def fix_offsets(odin_sent, all_offset):
         odin_sent['endOffsets'] = [(current + all_offset) for current in odin_sent['endOffsets']]
 
 
-def conllu_to_odin(conllu_sentences, odin_to_enhance=None, is_basic=False, push_new_to_end=True, remove_enhanced_extra_info=False, remove_bart_extra_info=True):
+def conllu_to_odin(conllu_sentences, odin_to_enhance=None, is_basic=False, push_new_to_end=True, remove_enhanced_extra_info=False, remove_bart_extra_info=True, eud_language=None):
     odin_sentences = []
     fixed_sentences = []
     texts = []
@@ -293,7 +362,7 @@ def conllu_to_odin(conllu_sentences, odin_to_enhance=None, is_basic=False, push_
             fixed_sentence, odin_to_enhance['sentences'][i] if odin_to_enhance else
             {'words': [token.get_conllu_field("form") for token in fixed_sentence if token.get_conllu_field("id").major != 0],
              'tags': [token.get_conllu_field("xpos") for token in fixed_sentence if token.get_conllu_field("id").major != 0]},
-            is_basic, remove_enhanced_extra_info, remove_bart_extra_info))
+            is_basic, remove_enhanced_extra_info, remove_bart_extra_info, eud_language))
 
     if odin_to_enhance:
         odin_to_enhance['sentences'] = odin_sentences
@@ -1,11 +1,34 @@
 import json
 from pathlib import Path
 
-with open(Path(__file__).parent.__str__() + "/eud_literal_allowed_list_en.json") as f:
-    en = json.load(f)
+# not sure we need to put these literals as well but to be on the safe sie since they are after `:` we included them
+BASE_EUD_LITERALS = ("cite", "preconj", "qmod", "prt", "predet", "nor", "negcc", "relcl")
+EUD_LITERAL_LANGUAGES = ("en", "he")
 
-with open(Path(__file__).parent.__str__() + "/eud_literal_allowed_list_he.json") as f:
-    he = json.load(f)
+# the per-language allow-lists are loaded on first use. the None language stands for all the languages together.
+_eud_literal_allowed_sets = dict()
 
-# not sure we need to put these literals as well but to be on the safe sie since they are after `:` we included them
-EUD_LITERAL_ALLOWED_LIST = ["cite", "preconj", "qmod", "prt", "predet", "nor", "negcc", "relcl"] + en + he
+
+def _load_eud_literals(language):
+    with open(Path(__file__).parent.__str__() + f"/eud_literal_allowed_list_{language}.json") as f:
+        return json.load(f)
+
+
+def get_eud_literal_allowed_set(language=None):
+    allowed = _eud_literal_allowed_sets.get(language)
+    if allowed is None:
+        if language is None:
+            allowed = frozenset().union(*[get_eud_literal_allowed_set(lang) for lang in EUD_LITERAL_LANGUAGES])
+        elif language in EUD_LITERAL_LANGUAGES:
+            allowed = frozenset(BASE_EUD_LITERALS).union(_load_eud_literals(language))
+        else:
+            raise ValueError(f"Unknown eud literals language {language}, expected one of {EUD_LITERAL_LANGUAGES}")
+        _eud_literal_allowed_sets[language] = allowed
+    return allowed
+
+
+def __getattr__(name):
+    # the combined list is kept for backward compatibility, and is loaded only if it is used
+    if name == "EUD_LITERAL_ALLOWED_LIST":
+        return list(BASE_EUD_LITERALS) + [literal for lang in EUD_LITERAL_LANGUAGES for literal in _load_eud_literals(lang)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
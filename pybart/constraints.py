@@ -1,5 +1,7 @@
+import re
+import sys
 from dataclasses import dataclass, field
-from typing import Sequence, Set, List, Optional, Callable, Any
+from typing import Sequence, Set, List, Optional, Callable, Any, Dict, Pattern
 from enum import Enum
 from math import inf
 from abc import ABC, abstractmethod
@@ -12,20 +14,63 @@ class FieldNames(Enum):
     ENTITY = 3
 
 
+# a value written between slashes (e.g. "/.subj.*/") is a regex rather than a verbatim string
+def is_regex_value(value: str) -> bool:
+    return len(value) > 1 and value.startswith('/') and value.endswith('/')
+
+
+class CachedRegex:
+    # the results are cached per distinct (interned) string, so each string is tested at most once per pattern.
+    #   strings like labels and tags come from a small vocabulary, but words don't, so the cache is bounded.
+    max_cached = 1 << 16
+
+    def __init__(self, pattern: Pattern):
+        self.pattern = pattern
+        self.results: Dict[str, bool] = dict()
+
+    def matches(self, string: str) -> bool:
+        try:
+            return self.results[string]
+        except KeyError:
+            is_match = self.pattern.search(string) is not None
+            if len(self.results) < self.max_cached:
+                self.results[sys.intern(string)] = is_match
+            return is_match
+
+
+# compiled patterns are shared between all the constraints that use them, and so are their cached results
+_compiled_regexes: Dict[Any, CachedRegex] = dict()
+
+
+def compile_regex_value(value: str, flags: int = 0) -> CachedRegex:
+    key = (value, flags)
+    if key not in _compiled_regexes:
+        _compiled_regexes[key] = CachedRegex(re.compile(value[1:-1], flags))
+    return _compiled_regexes[key]
+
+
 @dataclass(frozen=True)
 class Field:
     field: FieldNames
-    value: Sequence[str]  # match of one of the strings in a list
+    value: Sequence[str]  # match of one of the strings in a list (or of one of the regexes written as "/.../")
     in_sequence: bool = True
+    regexes: Sequence[CachedRegex] = field(default_factory=list, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         # validate value's value specifically because str is converted to list and this is hard to debug
         if not isinstance(self.value, list):
             raise ValueError(f"Expected <class 'list'> got {type(self.value)}")
-        object.__setattr__(self, 'value', [v.lower() for v in self.value])
+        # the content is lowercased before it is compared, so regexes are kept as is and ignore case instead
+        object.__setattr__(self, 'value', [v if is_regex_value(v) else v.lower() for v in self.value])
+        object.__setattr__(
+            self, 'regexes', [compile_regex_value(v, re.IGNORECASE) for v in self.value if is_regex_value(v)])
+
+    # checks only the value part of the constraint (that is, regardless of in_sequence)
+    def matches(self, content: str) -> bool:
+        return (content in self.value) or any(regex.matches(content) for regex in self.regexes)
 
     def satisfied(self, context: Any, get_content_by_field: Callable[[Any, FieldNames], str]) -> bool:
-        return not ((get_content_by_field(context, self.field).lower() in self.value) ^ self.in_sequence)
+        return not (self.matches(get_content_by_field(context, self.field).lower()) ^ self.in_sequence)
 
 
 @dataclass(frozen=True)
@@ -40,22 +85,24 @@ class HasLabelFromList(LabelPresence):
     # has at least one edge with value
     value: Sequence[str]
     is_regex: bool = field(default=False, init=False)
+    regexes: Sequence[CachedRegex] = field(default_factory=list, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         # validate value's value specifically because str is converted to list and this is hard to debug
         if not isinstance(self.value, list):
             raise ValueError(f"Expected <class 'list'> got {type(self.value)}")
-        if len(self.value) == 1 and self.value[0].startswith('/') and self.value[0].endswith('/'):
-            object.__setattr__(self, 'is_regex', True)
+        regexes = [compile_regex_value(v) for v in self.value if is_regex_value(v)]
+        object.__setattr__(self, 'regexes', regexes)
+        object.__setattr__(self, 'is_regex', len(regexes) > 0)
 
     def satisfied(self, actual_labels: List[str]) -> Optional[Set[str]]:
         # at least one of the constraint strings should match, so return False only if none of them did.
-        if self.is_regex:
-            return set(actual_labels)
-
         # for each edged label, check if the label matches the constraint, and store it if it does,
         #   because it is a positive search (that is at least one label should match)
         current_successfully_matched = [v for v in self.value if v in actual_labels]
+        if self.is_regex:
+            current_successfully_matched += \
+                [label for label in actual_labels if any(regex.matches(label) for regex in self.regexes)]
 
         if len(current_successfully_matched) == 0:
             return None
@@ -5,12 +5,14 @@
 #   3. we look for all fathers as we can have multiple fathers, while in SC they look at first one found.
 
 import sys
+import time
 from collections import defaultdict
 import inspect
 
 from .constraints import *
-from .graph_token import Label, TokenId
+from .graph_token import Label, TokenId, EditTracker
 from .matcher import Matcher, NamedConstraint
+from .cache import sentence_key
 from dataclasses import dataclass
 
 # constants   # TODO - english specific
@@ -451,7 +453,8 @@ def init_conversions(remove_node_adding_conversions, ud_version):
             else:
                 # get the id for this token or update the global ids for this new one.
                 if dep not in converter.iids:
-                    converter.iids[dep] = 0 if len(converter.iids.values()) == 0 else (max(converter.iids.values()) + 1)
+                    converter.iids[dep] = converter.next_iid
+                    converter.next_iid += 1
                 cur_iid = converter.iids[dep]
 
             # decide wether to propagte both the subject or object or both according to the criteria mentioned before
@@ -1607,74 +1610,192 @@ def remove_funcs(conversions, enhanced, enhanced_plus_plus, enhanced_extra, remo
     return conversions
 
 
+# holds a filtered conversion dict together with its compiled Matcher, so the constraints preprocessing and the
+#   matcher construction happen once per configuration and not once per sentence.
+class CompiledConversions:
+    def __init__(self, conversions):
+        self.conversions = conversions
+        self.matcher = Matcher([NamedConstraint(conversion_name, conversion.constraint)
+                                for conversion_name, conversion in conversions.items()])
+
+
+def compile_conversions(enhanced, enhanced_plus_plus, enhanced_extra, remove_enhanced_extra_info,
+                        remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version=1,
+                        one_time_initialized_conversions=None):
+    if one_time_initialized_conversions:
+        # copy, so the filtering below wont pop conversions out of the caller's dict
+        conversions = dict(one_time_initialized_conversions)
+    else:
+        conversions = init_conversions(remove_node_adding_conversions, ud_version)
+    conversions = remove_funcs(conversions, enhanced, enhanced_plus_plus, enhanced_extra, remove_enhanced_extra_info,
+                               remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel)
+    return CompiledConversions(conversions)
+
+
 class Convert:
     def __init__(self, *args):
         self.args = args
         self.iids = dict()
+        # the next free alternative id, as the ids are consecutive along the document
+        self.next_iid = 0
         self.cc_assignments = dict()
         # TODO - use kwargs
         self.remove_enhanced_extra_info = args[5]  # should be in the index of remove_enhanced_extra_info param
         self.remove_bart_extra_info = args[6]  # should be in the index of remove_bart_extra_info param
+        self.eud_language = args[14] if len(args) > 14 else None  # should be in the index of eud_language param
+        self.stats = args[15] if len(args) > 15 else None  # should be in the index of stats param
+        self.cache = args[16] if len(args) > 16 else None  # should be in the index of cache param
 
     def __call__(self):
         return self.convert(*self.args)
 
-    def get_rel_set(self, converted_sentence):
-        return set([(str(head.get_conllu_field("id")),
-                     rel.to_str(self.remove_enhanced_extra_info, self.remove_bart_extra_info),
-                     str(tok.get_conllu_field("id"))) for tok in converted_sentence
-                    for (head, rels) in tok.get_new_relations() for rel in rels])
+    def convert_more(self, parsed):
+        # converts more sentences of the same document (e.g. as it is streamed), so the alternatives (iids) continue
+        #   the document-wide numbering of the sentences converted before, as if they were all converted in one call
+        converted = self.convert(parsed, *self.args[1:])
+        # the tokens of these sentences won't be seen again, so forget them and keep only the next free iid
+        self.iids.clear()
+        self.cc_assignments.clear()
+        return converted
+
+    def changed_since(self, tracker, version):
+        # checks whether the serialized edge set of the sentence differs from the one it had at the given version.
+        #   only the edges in the journal since then are examined, so this doesn't depend on the sentence size.
+        deltas = defaultdict(int)
+        for edit in tracker.edits_since(version):
+            rel_str = edit.rel.to_str(self.remove_enhanced_extra_info, self.remove_bart_extra_info, self.eud_language)
+            deltas[(edit.child, edit.head, rel_str)] += 1 if edit.added else -1
+        for (child, head, rel_str), delta in deltas.items():
+            if delta == 0:
+                continue
+            # different labels may serialize the same, so compare the presence of the string and not of the label
+            count = sum(1 for _, rels in child.get_new_relations(head) for rel in rels
+                        if rel.to_str(self.remove_enhanced_extra_info, self.remove_bart_extra_info, self.eud_language) == rel_str)
+            if (count > 0) != (count - delta > 0):
+                return True
+        return False
 
     def convert(self, parsed, enhanced, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_enhanced_extra_info,
                 remove_bart_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel,
-                ud_version=1, one_time_initialized_conversions=None):
+                ud_version=1, one_time_initialized_conversions=None, compiled_conversions=None, eud_language=None,
+                stats=None, cache=None):
+
+        if compiled_conversions is None:
+            compiled_conversions = compile_conversions(
+                enhanced, enhanced_plus_plus, enhanced_extra, remove_enhanced_extra_info, remove_node_adding_conversions,
+                remove_unc, query_mode, funcs_to_cancel, ud_version, one_time_initialized_conversions)
 
-        if one_time_initialized_conversions:
-            conversions = one_time_initialized_conversions
-        else:
-            conversions = init_conversions(remove_node_adding_conversions, ud_version)
-        conversions = remove_funcs(conversions, enhanced, enhanced_plus_plus, enhanced_extra,
-                                   remove_enhanced_extra_info,
-                                   remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel)
+        if cache is not None:
+            # everything that the converted graph depends on, other than the sentence itself
+            cache_config = (tuple(compiled_conversions.conversions), conv_iterations, remove_enhanced_extra_info,
+                            remove_bart_extra_info, remove_node_adding_conversions, ud_version, eud_language)
 
         i = 0
         updated = []
         for sentence in parsed:
             sentence_as_list = [t for t in sentence if t.get_conllu_field("id").major != 0]
+            if cache is not None:
+                key = sentence_key(sentence_as_list, cache_config)
+                restored = cache.restore(key, self.next_iid)
+                if restored is not None:
+                    converted_sentence, iterations, new_iids = restored
+                    self.next_iid += new_iids
+                    i = max(i, iterations)
+                    updated.append(converted_sentence)
+                    continue
+                iids_before = self.next_iid
             assign_ccs_to_conjs(sentence_as_list, self.cc_assignments)
-            i = max(i, self.convert_sentence(sentence_as_list, conversions, conv_iterations))
+            iterations = self.convert_sentence(sentence_as_list, compiled_conversions.conversions, conv_iterations,
+                                               compiled_conversions.matcher)
+            i = max(i, iterations)
+            if cache is not None:
+                cache.store(key, sentence_as_list, iterations, iids_before, self.next_iid)
             updated.append(sentence_as_list)
 
         return updated, i
 
-    def convert_sentence(self, sentence: Sequence[Token], conversions, conv_iterations: int):
-        last_converted_sentence = None
+    def convert_sentence(self, sentence: Sequence[Token], conversions, conv_iterations: int, matcher=None):
+        # the optional instrumentation (see stats.ConversionStats), when it is None nothing is measured
+        stats = self.stats
+        start = time.perf_counter() if stats is not None else None
+        last_iter_version = 0
         i = 0
         on_last_iter = ["extra_amod_propagation"]
         do_last_iter = []
+        if matcher is None:
+            matcher = Matcher([NamedConstraint(conversion_name, conversion.constraint)
+                               for conversion_name, conversion in conversions.items()])
+        # journal the edges touched by each transformation, so that convergence is checked on the net edits of
+        #   an iteration, and so that on the following iterations we re-run only
+        #   the conversions that have a candidate token that was touched since they last ran,
+        #   by an edit of one of the labels that their matches depend on (see matcher.get_label_triggers).
+        #   (the rest would find exactly the same matches on exactly the same edges, and thus change nothing)
+        tracker = EditTracker()
+        _ = [tok.set_tracker(tracker) for tok in sentence]
+        last_run = dict()
+        candidates = dict()
+        sentence_len = len(sentence)
+        # the token field index and the feature bitmap of the sentence, shared by the matches of all the iterations
+        features = matcher.features(sentence, tracker)
         # we iterate till convergence or till user defined maximum is reached - the first to come.
-        matcher = Matcher([NamedConstraint(conversion_name, conversion.constraint)
-                           for conversion_name, conversion in conversions.items()])
         no_change_on_last_iter = False
         while i < conv_iterations:
-            last_converted_sentence = self.get_rel_set(sentence)
-            m = matcher(sentence)
+            last_iter_version = tracker.version
+            m = matcher(sentence, tracker, features) if stats is None else \
+                stats.run_matcher(matcher, sentence, tracker, features)
             for conv_name in m.names():
                 if conv_name in on_last_iter:
                     do_last_iter.append(conv_name)
                     continue
+                if conv_name in last_run:
+                    triggers = matcher.label_triggers[conv_name]
+                    if triggers is not None and not any(
+                            triggers.matches(edit.rel.base) for edit in tracker.edits_since(last_run[conv_name])):
+                        if stats is not None:
+                            stats.skip(conv_name)
+                        continue
+                    if conv_name not in candidates:
+                        candidates[conv_name] = {sentence[idx] for idx in m.candidates_for(conv_name)}
+                    if candidates[conv_name].isdisjoint(tracker.touched_since(last_run[conv_name])):
+                        if stats is not None:
+                            stats.skip(conv_name)
+                        continue
+                last_run[conv_name] = tracker.version
                 matches = m.matches_for(conv_name)
-                conversions[conv_name].transformation(sentence, matches, self)
-            if self.get_rel_set(sentence) == last_converted_sentence:
+                if stats is None:
+                    conversions[conv_name].transformation(sentence, matches, self)
+                else:
+                    stats.run_transformation(conv_name, conversions[conv_name], sentence, matches, self, tracker)
+                # a node was added, so every conversion has new candidates and should re-run
+                if len(sentence) != sentence_len:
+                    _ = [tok.set_tracker(tracker) for tok in sentence[sentence_len:]]
+                    sentence_len = len(sentence)
+                    last_run.clear()
+                    candidates.clear()
+                    features = matcher.features(sentence, tracker)
+            changed = self.changed_since(tracker, last_iter_version) if stats is None else \
+                stats.changed_since(self, tracker, last_iter_version)
+            if not changed:
                 no_change_on_last_iter = True
                 break
             i += 1
 
         for conv_name in do_last_iter:
-            m = matcher(sentence)
+            m = matcher(sentence, tracker, features) if stats is None else \
+                stats.run_matcher(matcher, sentence, tracker, features)
             matches = m.matches_for(conv_name)
-            conversions[conv_name].transformation(sentence, matches, self)
-        if (self.get_rel_set(sentence) != last_converted_sentence) and no_change_on_last_iter:
-            i += 1
-
+            if stats is None:
+                conversions[conv_name].transformation(sentence, matches, self)
+            else:
+                stats.run_transformation(conv_name, conversions[conv_name], sentence, matches, self, tracker)
+        if no_change_on_last_iter:
+            changed = self.changed_since(tracker, last_iter_version) if stats is None else \
+                stats.changed_since(self, tracker, last_iter_version)
+            if changed:
+                i += 1
+
+        # the journal is needed only during the conversion, so don't let the returned tokens keep it alive
+        _ = [tok.set_tracker(None) for tok in sentence]
+        if stats is not None:
+            stats.add_sentence(len(sentence), i, time.perf_counter() - start)
         return i
@@ -1,5 +1,10 @@
+import sys
+import threading
+import weakref
+from array import array
 from dataclasses import dataclass, field
-from .constants.constants import EUD_LITERAL_ALLOWED_LIST
+from typing import NamedTuple
+from .constants.constants import get_eud_literal_allowed_set
 
 
 @dataclass
@@ -17,23 +22,57 @@ class TokenId:
     def __lt__(self, other):
         return self.major < other.major or (self.major == other.major and self.minor < other.minor)
 
-@dataclass
 class Label:
-    base: str
-    eud: str = None
-    src: str = None
-    src_type: str = None
-    phrase: str = None
-    uncertain: bool = False
-    iid: int = None
-
-    def to_str(self, remove_enhanced_extra_info, remove_bart_extra_info):
+    # labels are immutable and interned (a flyweight): constructing a label equal to an existing one returns
+    #   the existing object, so equality and hashing are by identity, and each serialization is computed only once.
+    #   the intern table holds the labels weakly (their phrases and iids are open-ended), so a label that is no longer
+    #   used by any graph is dropped from it.
+    _fields = ("base", "eud", "src", "src_type", "phrase", "uncertain", "iid")
+    __slots__ = _fields + ("_strs", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+    # WeakValueDictionary.setdefault isn't atomic, so the misses are interned under a lock
+    _intern_lock = threading.Lock()
+
+    def __new__(cls, base, eud=None, src=None, src_type=None, phrase=None, uncertain=False, iid=None):
+        key = (base, eud, src, src_type, phrase, uncertain, iid)
+        label = cls._interned.get(key)
+        if label is None:
+            with cls._intern_lock:
+                # another thread may have interned an equal label meanwhile, and then that one is returned
+                label = cls._interned.get(key)
+                if label is None:
+                    label = object.__new__(cls)
+                    for attr, value in zip(cls._fields, key):
+                        object.__setattr__(label, attr, value)
+                    object.__setattr__(label, "_strs", dict())
+                    cls._interned[key] = label
+        return label
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Label is immutable, can't set '{name}'")
+
+    def __reduce__(self):
+        # re-intern when unpickled or copied
+        return Label, (self.base, self.eud, self.src, self.src_type, self.phrase, self.uncertain, self.iid)
+
+    def __repr__(self):
+        return f"Label(base={self.base!r}, eud={self.eud!r}, src={self.src!r}, src_type={self.src_type!r}, " \
+               f"phrase={self.phrase!r}, uncertain={self.uncertain!r}, iid={self.iid!r})"
+
+    # eud_language selects the allow-list of the euds that may appear literally (None allows those of all the languages)
+    def to_str(self, remove_enhanced_extra_info, remove_bart_extra_info, eud_language=None):
+        mode = (remove_enhanced_extra_info, remove_bart_extra_info, eud_language)
+        label_str = self._strs.get(mode)
+        if label_str is None:
+            label_str = self._strs[mode] = self._build_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language)
+        return label_str
+
+    def _build_str(self, remove_enhanced_extra_info, remove_bart_extra_info, eud_language):
         eud = ""
         if self.eud is not None:
             if not remove_enhanced_extra_info:
-                if self.eud.lower() not in EUD_LITERAL_ALLOWED_LIST:
-                    self.eud = "_other"
-                eud = ":" + self.eud.lower()
+                # an eud that isn't allowed to appear literally is written as "_other" (the label itself is unchanged)
+                eud = ":" + (self.eud.lower() if self.eud.lower() in get_eud_literal_allowed_set(eud_language) else "_other")
 
         bart = ""
         if self.src is not None:
@@ -53,16 +92,69 @@ class Label:
         return self.to_str(False, False) < other.to_str(False, False)
 
 
+class Edit(NamedTuple):
+    added: bool  # True for an added edge, False for a removed one
+    child: 'Token'
+    head: 'Token'
+    rel: Label
+    version: int
+
+
+class EditTracker:
+    # a per-sentence journal of the edges added or removed (and when), so a caller can tell whether and where
+    #   a sentence was touched since some point in time, without taking snapshots of the entire graph.
+    def __init__(self):
+        self.version = 0
+        self.log = []
+        self._touched = dict()
+
+    def record(self, added, child, head, rel):
+        self.version += 1
+        self.log.append(Edit(added, child, head, rel, self.version))
+        self._touched[child] = self.version
+        self._touched[head] = self.version
+
+    def touched_since(self, version):
+        return [token for token, touched_version in self._touched.items() if touched_version > version]
+
+    def edits_since(self, version):
+        # versions are consecutive and start at 1, so the log index of an edit is its version minus one
+        return self.log[version:]
+
+
+# the CoNLL-U fields in their column order, and the Token slot that stores each of them
+CONLLU_FIELDS = ("id", "form", "lemma", "upos", "xpos", "feats", "head", "deprel", "deps", "misc")
+_FIELD_SLOTS = {field_name: "_conllu_" + field_name for field_name in CONLLU_FIELDS}
+
+
 class Token:
+    # a sentence graph holds many tokens, so they are __slots__ records rather than objects with a dict of fields
+    __slots__ = tuple(_FIELD_SLOTS.values()) + ("_children", "_new_deps", "_tracker")
+
     def __init__(self, new_id, form, lemma, upos, xpos, feats, head, deprel, deps, misc):
         # format of CoNLL-U as described here: https://universaldependencies.org/format.html
-        self._conllu_info = {"id": new_id, "form": form, "lemma": lemma, "upos": upos, "xpos": xpos,
-                             "feats": feats, "head": head, "deprel": deprel, "deps": deps, "misc": misc}
-        self._children_list = []
+        self._conllu_id = new_id
+        self._conllu_form = form
+        self._conllu_lemma = lemma
+        self._conllu_upos = upos
+        self._conllu_xpos = xpos
+        self._conllu_feats = feats
+        self._conllu_head = head
+        self._conllu_deprel = deprel
+        self._conllu_deps = deps
+        self._conllu_misc = misc
+        # the children are an insertion-ordered set (a dict with no values), for constant time removal,
+        #   and the labels are interned, so the short per-head label lists are scanned by identity only.
+        self._children = dict()
         self._new_deps = dict()
+        self._tracker = None
+
+    def _conllu_values(self):
+        return (self._conllu_id, self._conllu_form, self._conllu_lemma, self._conllu_upos, self._conllu_xpos,
+                self._conllu_feats, self._conllu_head, self._conllu_deprel, self._conllu_deps, self._conllu_misc)
 
     def copy(self, new_id=None, form=None, lemma=None, upos=None, xpos=None, feats=None, head=None, deprel=None, deps=None, misc=None):
-        new_id_copy, form_copy, lemma_copy, upos_copy, xpos_copy, feats_copy, head_copy, deprel_copy, deps_copy, misc_copy = self._conllu_info.values()
+        new_id_copy, form_copy, lemma_copy, upos_copy, xpos_copy, feats_copy, head_copy, deprel_copy, deps_copy, misc_copy = self._conllu_values()
         return Token(new_id if new_id else new_id_copy,
                      form if form else form_copy,
                      lemma if lemma else lemma_copy,
@@ -75,29 +167,37 @@ class Token:
                      misc if misc else misc_copy)
 
     def add_child(self, child):
-        self._children_list.append(child)
+        self._children[child] = None
 
     def remove_child(self, child):
-        self._children_list.remove(child)
+        del self._children[child]
 
     def get_children(self):
-        return self._children_list
+        return self._children.keys()
 
     def get_children_with_rels(self):
         return [(child, list(child.get_new_relations(self))[0][1]) for child in self.get_children()]
 
-    def get_conllu_string(self, remove_enhanced_extra_info, remove_bart_extra_info):
+    def get_conllu_string(self, remove_enhanced_extra_info, remove_bart_extra_info, eud_language=None):
         # for 'deps' field, we need to sort the new relations and then add them with '|' separation,
         # as required by the format.
         sorted_ = sorted((h, sorted(rels)) for h, rels in self.get_new_relations())
-        self._conllu_info["deps"] = "|".join([str(a.get_conllu_field('id')) + ":" + bb.to_str(remove_enhanced_extra_info, remove_bart_extra_info) for (a, b) in sorted_ for bb in b])
-        return "\t".join([str(v) for v in self._conllu_info.values()])
+        self._conllu_deps = "|".join([str(a.get_conllu_field('id')) + ":" + bb.to_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language) for (a, b) in sorted_ for bb in b])
+        return "\t".join([str(v) for v in self._conllu_values()])
 
     def set_conllu_field(self, field, val):
-        self._conllu_info[field] = val
+        setattr(self, _FIELD_SLOTS[field], val)
 
     def get_conllu_field(self, field):
-        return self._conllu_info[field]
+        return getattr(self, _FIELD_SLOTS[field])
+
+    def set_tracker(self, tracker):
+        self._tracker = tracker
+
+    def get_edit_log(self):
+        # the edges added and removed so far in this token's sentence, in order (for debugging).
+        #   the tracker is detached once the sentence is converted, so this is empty afterwards
+        return self._tracker.log if self._tracker is not None else []
 
     def get_parents(self):
         return self._new_deps.keys()
@@ -111,6 +211,12 @@ class Token:
         else:
             return self._new_deps.items()
 
+    def _record_edit(self, added, rel, head):
+        # a freshly added node doesn't have a tracker yet, but its head (from the same sentence) might
+        tracker = self._tracker if self._tracker is not None else head._tracker
+        if tracker is not None:
+            tracker.record(added, self, head, rel)
+
     def add_edge(self, rel, head):
         assert isinstance(rel, Label)
         if head in self._new_deps:
@@ -120,6 +226,7 @@ class Token:
         else:
             self._new_deps[head] = [rel]
             head.add_child(self)
+        self._record_edit(True, rel, head)
 
     def remove_edge(self, rel, head):
         assert isinstance(rel, Label)
@@ -128,9 +235,13 @@ class Token:
             if not self._new_deps[head]:
                 self._new_deps.pop(head)
                 head.remove_child(self)
+            self._record_edit(False, rel, head)
 
     def remove_all_edges(self):
-        _ = [self.remove_edge(edge, head) for head, edges in list(self.get_new_relations()) for edge in edges]
+        # remove_edge shrinks the per-head label lists, so iterate over copies of them
+        for head, edges in list(self._new_deps.items()):
+            for edge in list(edges):
+                self.remove_edge(edge, head)
 
     def replace_edge(self, old_rel, new_rel, old_head, new_head):
         self.remove_edge(old_rel, old_head)
@@ -152,3 +263,101 @@ def add_basic_edges(sentence):
         head = token.get_conllu_field('head')
         if head is not None:
             sentence[cur_id].add_edge(Label(token.get_conllu_field('deprel')), sentence[head.major - 1])
+
+
+class CompactSentence:
+    """An array-backed form of a sentence graph, for holding many sentences in memory.
+
+    The token fields are stored column-wise (strings are interned, ids are integer arrays),
+    and the edges as parallel integer arrays of child index, head index and label id (into the sentence's own table
+    of its distinct labels, so no table outlives the sentences).
+    A head that isn't part of the sentence list (i.e. the root) has the index -1.
+    to_tokens restores the Token graph (with the same edge and children order), which is what Matcher and
+    the conversions work on.
+    """
+    __slots__ = ("id_majors", "id_minors", "head_majors", "head_minors", "other_heads", "columns",
+                 "edge_children", "edge_heads", "edge_labels", "labels", "children", "children_offsets")
+
+    # the string fields, in their column order
+    string_fields = ("form", "lemma", "upos", "xpos", "feats", "deprel", "deps", "misc")
+    # the integer arrays, except for the label ids
+    _array_names = ("id_majors", "id_minors", "head_majors", "head_minors", "edge_children", "edge_heads",
+                    "children", "children_offsets")
+
+    def __init__(self, sentence):
+        index = {token: i for i, token in enumerate(sentence)}
+        self.id_majors = array('i', (token.get_conllu_field("id").major for token in sentence))
+        self.id_minors = array('i', (token.get_conllu_field("id").minor for token in sentence))
+        # the basic head is a TokenId, but nodes added by the conversions may have a placeholder string instead
+        heads = [token.get_conllu_field("head") for token in sentence]
+        self.head_majors = array('i', (head.major if isinstance(head, TokenId) else -1 for head in heads))
+        self.head_minors = array('i', (head.minor if isinstance(head, TokenId) else -1 for head in heads))
+        self.other_heads = {i: head for i, head in enumerate(heads) if not isinstance(head, TokenId) and head is not None}
+        self.columns = tuple(
+            tuple(None if value is None else sys.intern(value) for value in (token.get_conllu_field(field_name) for token in sentence))
+            for field_name in self.string_fields)
+
+        self.edge_children = array('i')
+        self.edge_heads = array('i')
+        self.edge_labels = array('i')
+        label_ids = dict()
+        root = None
+        for i, token in enumerate(sentence):
+            for head, rels in token.get_new_relations():
+                head_index = index.get(head, -1)
+                if head_index == -1:
+                    root = head
+                for rel in rels:
+                    self.edge_children.append(i)
+                    self.edge_heads.append(head_index)
+                    self.edge_labels.append(label_ids.setdefault(rel, len(label_ids)))
+        self.labels = tuple(label_ids)
+
+        # the children lists keep their own order (of the edge additions), so store them as well.
+        #   the last entry is for the root, if it isn't part of the sentence list.
+        self.children = array('i')
+        self.children_offsets = array('i', [0])
+        for token in list(sentence) + [root]:
+            if token is not None:
+                self.children.extend(index[child] for child in token.get_children())
+            self.children_offsets.append(len(self.children))
+
+    def __len__(self):
+        return len(self.id_majors)
+
+    # the arrays of the sentence as plain lists (e.g. for JSON), with the labels given by value (as the arguments
+    #   of Label), so it can be restored in another process
+    def to_state(self):
+        state = {name: list(getattr(self, name)) for name in self._array_names}
+        state["other_heads"] = {str(i): head for i, head in self.other_heads.items()}
+        state["columns"] = [list(column) for column in self.columns]
+        state["edge_labels"] = list(self.edge_labels)
+        state["labels"] = [list(label.__reduce__()[1]) for label in self.labels]
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        compact = object.__new__(cls)
+        for name in cls._array_names:
+            setattr(compact, name, array('i', state[name]))
+        compact.other_heads = {int(i): head for i, head in state["other_heads"].items()}
+        compact.columns = tuple(tuple(None if value is None else sys.intern(value) for value in column)
+                                for column in state["columns"])
+        compact.edge_labels = array('i', state["edge_labels"])
+        compact.labels = tuple(Label(*label_args) for label_args in state["labels"])
+        return compact
+
+    def to_tokens(self):
+        tokens = []
+        for i, values in enumerate(zip(*self.columns)):
+            form, lemma, upos, xpos, feats, deprel, deps, misc = values
+            head = self.other_heads.get(i) if self.head_majors[i] == -1 else TokenId(self.head_majors[i], self.head_minors[i])
+            tokens.append(Token(TokenId(self.id_majors[i], self.id_minors[i]), form, lemma, upos, xpos, feats, head, deprel, deps, misc))
+        root = Token(TokenId(0), None, None, None, None, None, None, None, None, None) if -1 in self.edge_heads else None
+
+        for child, head, label_id in zip(self.edge_children, self.edge_heads, self.edge_labels):
+            tokens[child]._new_deps.setdefault(root if head == -1 else tokens[head], []).append(self.labels[label_id])
+        for i, token in enumerate(tokens + [root]):
+            if token is not None:
+                token._children = dict.fromkeys(tokens[child] for child in self.children[self.children_offsets[i]:self.children_offsets[i + 1]])
+        return tokens
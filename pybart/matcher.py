@@ -17,7 +17,7 @@ from dataclasses import replace
 from collections import defaultdict
 from typing import NamedTuple, Sequence, Mapping, Any, List, Tuple, Generator, Dict, Optional
 from .constraints import *
-from .graph_token import Token as BartToken
+from .graph_token import Token as BartToken, EditTracker
 
 
 # ********************************************* BartSentence functionality *********************************************
@@ -30,6 +30,32 @@ def get_content_by_field(tok: BartToken, cur_field: FieldNames) -> str:
     return tok.get_conllu_field(field_by_field[cur_field])
 
 
+# an index from the lowercased content of each token field to the positions of the tokens that have it,
+#   so field constraints can be resolved by set lookups instead of checking every token.
+#   it is built once per sentence and shared by all the constraints of the matcher.
+class TokenFieldIndex:
+    def __init__(self, sentence: Sequence[BartToken]):
+        self.size = len(sentence)
+        self.all_positions = set(range(self.size))
+        self.positions = {cur_field: defaultdict(set) for cur_field in field_by_field}
+        for i, tok in enumerate(sentence):
+            for cur_field, field_positions in self.positions.items():
+                field_positions[get_content_by_field(tok, cur_field).lower()].add(i)
+
+    # returns the positions of the tokens that satisfy the given field constraint
+    def lookup(self, field_con: Field) -> Set[int]:
+        field_positions = self.positions[field_con.field]
+        matched = set()
+        for value in field_con.value:
+            matched.update(field_positions.get(value, ()))
+        # regexes are tested against the distinct contents rather than against every token
+        if field_con.regexes:
+            for content, positions in field_positions.items():
+                if any(regex.matches(content) for regex in field_con.regexes):
+                    matched.update(positions)
+        return matched if field_con.in_sequence else self.all_positions - matched
+
+
 # gets the verbatim of a token in position i in the sentence
 def get_text(sentence: Sequence[BartToken], i: int) -> str:
     return sentence[i].get_conllu_field("form")
@@ -52,6 +78,22 @@ def get_labels(sentence: Sequence[BartToken], child: int = None, parent: int = N
     return labels
 
 
+# maps each token of the sentence to its index in the sentence
+def get_token_index(sentence: Sequence[BartToken]) -> Dict[BartToken, int]:
+    return {tok: i for i, tok in enumerate(sentence)}
+
+
+# returns the indices of the tokens that have an edge going into the given child
+#   (the root is not part of the sentence, and hence is never returned)
+def get_parents(sentence: Sequence[BartToken], token_index: Mapping[BartToken, int], child: int) -> List[int]:
+    return [token_index[head] for head in sentence[child].get_parents() if head in token_index]
+
+
+# returns the indices of the tokens that have an edge coming from the given parent
+def get_children(sentence: Sequence[BartToken], token_index: Mapping[BartToken, int], parent: int) -> List[int]:
+    return [token_index[child] for child in sentence[parent].get_children() if child in token_index]
+
+
 # function that checks that a sequence of Label constraints is satisfied
 def get_matched_labels(label_constraints: Sequence[LabelPresence], actual_labels: List[str]) -> Optional[Set[str]]:
     successfully_matched = set()
@@ -85,7 +127,6 @@ class MatchingResult:
 class GlobalMatcher:
     def __init__(self, constraint: Full):
         self.constraint = constraint
-        self.captured_labels = defaultdict(set)
         # list of token ids that don't require a capture
         self.dont_capture_names = [token.id for token in constraint.tokens if not token.capture]
 
@@ -128,34 +169,55 @@ class GlobalMatcher:
             return {}
         return merged_assignment
 
-    def _filter_edge_constraints(self, matches: Mapping[str, List[int]], sentence: Sequence[BartToken]) \
+    # Note - captured labels are stored into the given dict, which should be scoped to a single matching call,
+    #   so no state is kept on the (shared) matcher itself
+    def _filter_edge_constraints(self, matches: Mapping[str, List[int]], sentence: Sequence[BartToken],
+                                 captured_labels: Dict[Tuple[str, int, str, int], Set[str]] = None) \
             -> List[Tuple[bool, List[Dict[str, int]]]]:
+        if captured_labels is None:
+            captured_labels = defaultdict(set)
         edges_assignments = list()
+        token_index = None
         # pick possible assignments according to the edge constraint
         for edge in self.constraint.edges:
             edge_assignments = []
-            # try each pair as a candidate
             # Note - we assume that if a token is not in the matches dict, then it was an optional one,
             #   and thus we can skip on this edge constraint
             # Note2 - we assume that if a node is not mentioned in any edge constraint,
             #   then it is a redundant token-constraint
-            for child in matches.get(edge.child, []):
-                for parent in matches.get(edge.parent, []):
-                    if child == parent:
-                        continue
-                    # check if edge constraint is satisfied
-                    captured_labels = None
-                    actual_labels = get_labels(sentence, child=child, parent=parent)
-                    if actual_labels:
-                        captured_labels = get_matched_labels(edge.label, actual_labels)
-                    if captured_labels is None:
-                        continue
-                    # TODO - compare the speed of non-edge filtering here to the current post-merging location:
-                    #   "if self._filter(assignment, sentence)"
-                    # store all captured labels according to the child-parent token pair
-                    self.captured_labels[(edge.child, child, edge.parent, parent)].update(captured_labels)
-                    # keep the filtered assignment for further merging
-                    edge_assignments.append({edge.child: child, edge.parent: parent})
+            children = matches.get(edge.child, [])
+            parents = matches.get(edge.parent, [])
+            if children and parents:
+                if token_index is None:
+                    token_index = get_token_index(sentence)
+                # instead of trying each child-parent pair as a candidate, walk the actual edges of the graph,
+                #   starting from the side with less candidates
+                children_order = {child: i for i, child in enumerate(children)}
+                parents_order = {parent: i for i, parent in enumerate(parents)}
+                if len(children) <= len(parents):
+                    pairs = [(child, parent) for child in children
+                             for parent in get_parents(sentence, token_index, child) if parent in parents_order]
+                else:
+                    pairs = [(child, parent) for parent in parents
+                             for child in get_children(sentence, token_index, parent) if child in children_order]
+                # keep the order of the candidates, as the order of the matches is visible to the transformations
+                pairs.sort(key=lambda pair: (children_order[pair[0]], parents_order[pair[1]]))
+            else:
+                pairs = []
+            for child, parent in pairs:
+                if child == parent:
+                    continue
+                # check if edge constraint is satisfied
+                matched_labels = None
+                actual_labels = get_labels(sentence, child=child, parent=parent)
+                if actual_labels:
+                    matched_labels = get_matched_labels(edge.label, actual_labels)
+                if matched_labels is None:
+                    continue
+                # store all captured labels according to the child-parent token pair
+                captured_labels[(edge.child, child, edge.parent, parent)].update(matched_labels)
+                # keep the filtered assignment for further merging
+                edge_assignments.append({edge.child: child, edge.parent: parent})
             if edge_assignments:
                 edges_assignments.append((edge.optional, edge_assignments))
             elif not edge.optional:
@@ -163,7 +225,27 @@ class GlobalMatcher:
         return edges_assignments
 
     @staticmethod
-    def _merge_edges_assignments(edges_assignments: List[Tuple[bool, List[Dict[str, int]]]]) -> List[Dict[str, int]]:
+    def _plan_merge_order(edges_assignments: List[Tuple[bool, List[Dict[str, int]]]]) -> List[int]:
+        # the required edges that precede the first optional edge can be joined in any order without changing
+        #   the result, so join them by selectivity: start from the one with the least assignments and keep picking
+        #   the smallest edge that shares a token with the already joined ones (to avoid cross products).
+        #   an optional edge's outcome depends on what was bound before it, so from there on keep the declared order.
+        prefix_len = next((i for i, (is_optional, _) in enumerate(edges_assignments) if is_optional),
+                          len(edges_assignments))
+        remaining = list(range(prefix_len))
+        order = []
+        bound = set()
+        while remaining:
+            connected = [i for i in remaining if not bound.isdisjoint(edges_assignments[i][1][0])]
+            best = min(connected or remaining, key=lambda i: len(edges_assignments[i][1]))
+            remaining.remove(best)
+            order.append(best)
+            bound.update(edges_assignments[best][1][0])
+        return order + list(range(prefix_len, len(edges_assignments)))
+
+    @staticmethod
+    def _fold_edges_assignments(edges_assignments: List[Tuple[bool, List[Dict[str, int]]]],
+                                is_consistent: Callable[[Mapping[str, int]], bool] = None) -> List[Dict[str, int]]:
         merges = []
         # for each list of possible assignments of an edge
         for edge_is_optional, edge_assignments in edges_assignments:
@@ -186,24 +268,87 @@ class GlobalMatcher:
                 return []
             merges = new_merges
 
-        return merges
+        return merges if is_consistent is None else [merged for merged in merges if is_consistent(merged)]
+
+    @staticmethod
+    def _merge_edges_assignments(edges_assignments: List[Tuple[bool, List[Dict[str, int]]]],
+                                 is_consistent: Callable[[Mapping[str, int]], bool] = None) -> List[Dict[str, int]]:
+        # planning only pays off when the intermediate merges can grow (i.e. more than a handful of combinations),
+        #   below that the plain fold in the declared order, filtering only the complete merges, is cheaper
+        combinations = 1
+        for _, edge_assignments in edges_assignments:
+            combinations *= len(edge_assignments)
+        if combinations <= 64:
+            return GlobalMatcher._fold_edges_assignments(edges_assignments, is_consistent)
+        order = GlobalMatcher._plan_merge_order(edges_assignments)
+        # when the order was changed, each merge is kept along with the index of the assignment it took from each
+        #   edge (-1 for skipping an optional edge), so the output can be put back in the declared order of the edges
+        reordered = any(i != edge_idx for i, edge_idx in enumerate(order))
+        merges = [({}, (-1,) * len(edges_assignments) if reordered else None)] if edges_assignments else []
+        for edge_idx in order:
+            edge_is_optional, edge_assignments = edges_assignments[edge_idx]
+            names = tuple(edge_assignments[0])
+            # index the assignments by the values of the tokens they share with a merge (hash join).
+            #   which of the edge's tokens are already bound may differ between merges, because of optional edges.
+            indices = dict()
+            new_merges = []
+            # for each merged assignment
+            for merged, chosen in merges:
+                shared = tuple(name for name in names if name in merged)
+                if shared not in indices:
+                    index = defaultdict(list)
+                    for i, assignment in enumerate(edge_assignments):
+                        index[tuple(assignment[name] for name in shared)].append((i, assignment))
+                    indices[shared] = index
+                candidates = indices[shared].get(tuple(merged[name] for name in shared), ())
+                # for each possible assignment in the current list
+                edge_added = False
+                for i, assignment in candidates:
+                    # try to merge (see that there is no contradiction on hashing)
+                    just_merged = GlobalMatcher._try_merge(merged, assignment)
+                    if not just_merged:
+                        continue
+                    edge_added = True
+                    # drop the merge as soon as it fails a filter over its already bound tokens,
+                    #   as more tokens can only be added to it and never replaced
+                    if is_consistent is None or is_consistent(just_merged):
+                        new_merges.append(
+                            (just_merged, chosen[:edge_idx] + (i,) + chosen[edge_idx + 1:] if reordered else None))
+                # this is in case we couldnt merge any new assignment of an optional edge to an existing merge,
+                # we simply add the merge as is
+                if not edge_added and edge_is_optional:
+                    new_merges.append((merged, chosen))
+            if not new_merges:
+                return []
+            merges = new_merges
+
+        if reordered:
+            merges.sort(key=lambda merge: merge[1])
+        return [merged for merged, _ in merges]
 
     def apply(self, matches: Mapping[str, List[int]], sentence: Sequence[BartToken]) \
             -> Generator[MatchingResult, None, None]:
-        filtered = self._filter_edge_constraints(matches, sentence)
-        merges = self._merge_edges_assignments(filtered)
+        # the captured labels live only as long as this call (that is, a single sentence evaluation)
+        captured_labels = defaultdict(set)
+        filtered = self._filter_edge_constraints(matches, sentence, captured_labels)
+        # the distance and concat filters are applied during the merge, as soon as their tokens are bound
+        merges = self._merge_edges_assignments(
+            filtered, (lambda assignment: self._filter_distance_constraints(assignment) and
+                       self._filter_concat_constraints(assignment, sentence))
+            if self.constraint.distances or self.constraint.concats else None)
 
         for merged_assignment in merges:
-            # TODO - compare the speed of non-edge filtering here to the on-going edge filter (see previous todo)
-            if self._filter_distance_constraints(merged_assignment) and \
-                    self._filter_concat_constraints(merged_assignment, sentence):
-                # keep only required captures
-                _ = [merged_assignment.pop(name, None) for name in self.dont_capture_names]
-                captured_labels = {(v1, v2): labels for (k1, v1, k2, v2), labels in self.captured_labels.items()
-                                   if k1 in merged_assignment and merged_assignment[k1] == v1 and
-                                   k2 in merged_assignment and merged_assignment[k2] == v2}
-                # append assignment to output
-                yield MatchingResult(merged_assignment, captured_labels)
+            # keep only required captures
+            _ = [merged_assignment.pop(name, None) for name in self.dont_capture_names]
+            # look up the captures of this assignment by its edges, instead of scanning all the captures
+            assignment_labels = dict()
+            for edge in self.constraint.edges:
+                if edge.child in merged_assignment and edge.parent in merged_assignment:
+                    key = (edge.child, merged_assignment[edge.child], edge.parent, merged_assignment[edge.parent])
+                    if key in captured_labels:
+                        assignment_labels[(key[1], key[3])] = captured_labels[key]
+            # append assignment to output
+            yield MatchingResult(merged_assignment, assignment_labels)
 
 
 class TokenMatcher:
@@ -240,27 +385,34 @@ class TokenMatcher:
                 checked_tokens[name].append(token)
         return checked_tokens
 
-    def _match_tokens(self, sentence: Sequence[BartToken]) -> Mapping[str, List[int]]:
+    def _match_tokens(self, sentence: Sequence[BartToken], index: TokenFieldIndex = None) -> Mapping[str, List[int]]:
         matched_tokens = defaultdict(list)
+        if index is None:
+            index = TokenFieldIndex(sentence)
 
         for con_name, field_cons in self.spec_constraints.items():
             if not field_cons:
                 matched_tokens[con_name] = list(range(len(sentence)))
                 continue
-            for i, tok in enumerate(sentence):
-                satisfied_tok = True
-                for field_con in field_cons:
-                    if not field_con.satisfied(tok, get_content_by_field):
-                        satisfied_tok = False
-                        break
-                if satisfied_tok:
-                    matched_tokens[con_name].append(i)
+            # a token should satisfy all of the field constraints
+            satisfied_toks = index.lookup(field_cons[0])
+            for field_con in field_cons[1:]:
+                if not satisfied_toks:
+                    break
+                satisfied_toks = satisfied_toks.intersection(index.lookup(field_con))
+            if satisfied_toks:
+                matched_tokens[con_name] = sorted(satisfied_toks)
 
         return matched_tokens
 
-    def apply(self, sentence: Sequence[BartToken]) -> Optional[Mapping[str, List[int]]]:
+    # the indices of the tokens that could take part in any match, judged only by their (static) token fields
+    def candidates(self, sentence: Sequence[BartToken], index: TokenFieldIndex = None) -> Set[int]:
+        return {i for token_indices in self._match_tokens(sentence, index).values() for i in token_indices}
+
+    def apply(self, sentence: Sequence[BartToken], index: TokenFieldIndex = None) \
+            -> Optional[Mapping[str, List[int]]]:
         # match tokens according to their basic per-token/local features
-        matched_tokens = self._match_tokens(sentence)
+        matched_tokens = self._match_tokens(sentence, index)
 
         # extra token matching out of spacy's scope
         matched_tokens = self._post_local_matcher(matched_tokens, sentence)
@@ -272,21 +424,159 @@ class TokenMatcher:
         return matched_tokens
 
 
+# a feature a sentence must have for a constraint to match it: one of the values (or regexes) of an edge label
+#   ("label") or of a token field (a FieldNames) should appear somewhere in the sentence
+class FeatureRequirement(NamedTuple):
+    kind: Any
+    values: frozenset
+    regexes: Tuple[CachedRegex, ...]
+
+
+# the requirements implied by the required (non optional) parts of a preprocessed constraint:
+#   the label constraints of its edges and tokens, and the field constraints of its tokens
+#   (including the words that preprocess_constraint derived from the concats)
+def get_required_features(constraint: Full) -> List[FeatureRequirement]:
+    requirements = []
+
+    def add_label_requirements(label_constraints):
+        for label_constraint in label_constraints:
+            if isinstance(label_constraint, HasLabelFromList):
+                requirements.append(FeatureRequirement(
+                    "label", frozenset(v for v in label_constraint.value if not is_regex_value(v)), tuple(label_constraint.regexes)))
+
+    for tok in constraint.tokens:
+        if tok.optional:
+            continue
+        for field_con in tok.spec:
+            if field_con.in_sequence and field_con.field in field_by_field:
+                requirements.append(FeatureRequirement(
+                    field_con.field, frozenset(v for v in field_con.value if not is_regex_value(v)), tuple(field_con.regexes)))
+        add_label_requirements(tok.incoming_edges)
+        add_label_requirements(tok.outgoing_edges)
+    for edge in constraint.edges:
+        if not edge.optional:
+            add_label_requirements(edge.label)
+    return list(dict.fromkeys(requirements))
+
+
+# assigns a bit to each feature that some constraint requires, so that the requirements of a constraint are
+#   compiled into bit masks (a mask per requirement, of its alternatives), and the features of a sentence into
+#   a bitmap, and a constraint that can't match the sentence is rejected by a few integer operations.
+class FeatureVocabulary:
+    def __init__(self):
+        self.bits = dict()
+        self.regex_bits = defaultdict(list)
+        self.size = 0
+
+    def _new_bit(self):
+        self.size += 1
+        return 1 << (self.size - 1)
+
+    def compile(self, requirements: Sequence[FeatureRequirement]) -> List[int]:
+        masks = []
+        for requirement in requirements:
+            mask = 0
+            for value in requirement.values:
+                if (requirement.kind, value) not in self.bits:
+                    self.bits[(requirement.kind, value)] = self._new_bit()
+                mask |= self.bits[(requirement.kind, value)]
+            for regex in requirement.regexes:
+                kind_regex_bits = self.regex_bits[requirement.kind]
+                bit = next((bit for known_regex, bit in kind_regex_bits if known_regex is regex), None)
+                if bit is None:
+                    bit = self._new_bit()
+                    kind_regex_bits.append((regex, bit))
+                mask |= bit
+            masks.append(mask)
+        return masks
+
+    def bitmap(self, kind, contents) -> int:
+        bitmap = 0
+        for content in contents:
+            bitmap |= self.bits.get((kind, content), 0)
+        for regex, bit in self.regex_bits.get(kind, ()):
+            if any(regex.matches(content) for content in contents):
+                bitmap |= bit
+        return bitmap
+
+
+# the feature bitmap of a sentence: the token fields are taken from the (static) token field index,
+#   and the edge labels are collected again only when the sentence was edited since (per the tracker, if given)
+class SentenceFeatures:
+    def __init__(self, vocabulary: FeatureVocabulary, sentence: Sequence[BartToken], index: TokenFieldIndex,
+                 tracker: EditTracker = None):
+        self.vocabulary = vocabulary
+        self.sentence = sentence
+        self.index = index
+        self.tracker = tracker
+        self.field_bitmap = 0
+        for cur_field, field_positions in index.positions.items():
+            self.field_bitmap |= vocabulary.bitmap(cur_field, field_positions.keys())
+        self._labels_version = None
+        self._bitmap = 0
+
+    def bitmap(self) -> int:
+        version = (self.tracker.version, len(self.sentence)) if self.tracker is not None else None
+        if version is None or version != self._labels_version:
+            labels = {rel.base for tok in self.sentence for _, rels in tok.get_new_relations() for rel in rels}
+            self._bitmap = self.field_bitmap | self.vocabulary.bitmap("label", labels)
+            self._labels_version = version
+        return self._bitmap
+
+    def satisfies(self, masks: Sequence[int]) -> bool:
+        bitmap = self.bitmap()
+        return all(mask & bitmap for mask in masks)
+
+
 class Match:
     def __init__(self, token_matchers: Mapping[str, TokenMatcher],
-                 global_matchers: Mapping[str, GlobalMatcher], sentence: Sequence[BartToken]):
+                 global_matchers: Mapping[str, GlobalMatcher], sentence: Sequence[BartToken],
+                 feature_masks: Mapping[str, List[int]] = None, vocabulary: FeatureVocabulary = None,
+                 tracker: EditTracker = None, features: SentenceFeatures = None):
         assert token_matchers.keys() == global_matchers.keys()
         self.token_matchers = token_matchers
         self.global_matchers = global_matchers
         self.sentence = sentence
+        self.feature_masks = feature_masks
+        self.vocabulary = vocabulary
+        self.tracker = tracker
+        self._index = features.index if features is not None else None
+        self._features = features
+
+    # the token field index of the sentence, shared by all the constraints.
+    #   (nodes can be added to the sentence between calls, in which case the index is rebuilt)
+    def _get_index(self) -> TokenFieldIndex:
+        if self._index is None or self._index.size != len(self.sentence):
+            self._index = TokenFieldIndex(self.sentence)
+        return self._index
+
+    def _get_features(self) -> SentenceFeatures:
+        index = self._get_index()
+        if self._features is None or self._features.index is not index:
+            self._features = SentenceFeatures(self.vocabulary, self.sentence, index, self.tracker)
+        return self._features
+
+    # a cheap check of whether the sentence has the features that the constraint requires (see get_required_features).
+    #   False means the constraint can't match the sentence, True means it may.
+    def may_match(self, name: str) -> bool:
+        if self.feature_masks is None:
+            return True
+        return self._get_features().satisfies(self.feature_masks[name])
 
     def names(self) -> List[str]:
         # return constraint-name list
         return list(self.token_matchers.keys())
 
+    def candidates_for(self, name: str) -> Set[int]:
+        return self.token_matchers[name].candidates(self.sentence, self._get_index())
+
     def matches_for(self, name: str) -> Generator[MatchingResult, None, None]:
+        # reject the constraints whose required features are missing from the sentence, before any token matching
+        if not self.may_match(name):
+            return
+
         # token match
-        matches = self.token_matchers[name].apply(self.sentence)
+        matches = self.token_matchers[name].apply(self.sentence, self._get_index())
         if matches is None:
             return
 
@@ -294,6 +584,39 @@ class Match:
         yield from self.global_matchers[name].apply(matches, self.sentence)
 
 
+# the edge labels that the matches of a constraint depend on: adding or removing an edge with any other label
+#   can't change the matches. (that is, the labels and regexes of its label constraints)
+class LabelTriggers:
+    def __init__(self, labels: Set[str], regexes: Sequence[CachedRegex]):
+        self.labels = labels
+        self.regexes = regexes
+
+    def matches(self, label: str) -> bool:
+        return (label in self.labels) or any(regex.matches(label) for regex in self.regexes)
+
+
+# returns None when any label may change the matches of the constraint, that is when it has a no_children token
+#   or an edge constraint that is satisfied by some edge whatever its label (no HasLabelFromList on it)
+def get_label_triggers(constraint: Full) -> Optional[LabelTriggers]:
+    if any(tok.no_children for tok in constraint.tokens):
+        return None
+    if any(not any(isinstance(label, HasLabelFromList) for label in edge.label) for edge in constraint.edges):
+        return None
+    labels = set()
+    regexes = []
+    label_constraints = [label for edge in constraint.edges for label in edge.label] + \
+        [label for tok in constraint.tokens for label in list(tok.incoming_edges) + list(tok.outgoing_edges)]
+    for label_constraint in label_constraints:
+        if isinstance(label_constraint, HasLabelFromList):
+            labels.update(v for v in label_constraint.value if not is_regex_value(v))
+            regexes.extend(regex for regex in label_constraint.regexes if regex not in regexes)
+        elif isinstance(label_constraint, HasNoLabel):
+            labels.add(label_constraint.value)
+        else:
+            return None
+    return LabelTriggers(labels, regexes)
+
+
 class NamedConstraint(NamedTuple):
     name: str
     constraint: Full
@@ -348,6 +671,9 @@ class Matcher:
     def __init__(self, constraints: Sequence[NamedConstraint]):
         self.token_matchers = dict()
         self.global_matchers = dict()
+        self.label_triggers = dict()
+        self.feature_masks = dict()
+        self.vocabulary = FeatureVocabulary()
         for constraint in constraints:
             # preprocess the constraints (optimizations)
             preprocessed_constraint = preprocess_constraint(constraint.constraint)
@@ -355,7 +681,18 @@ class Matcher:
             # initialize internal matchers
             self.token_matchers[constraint.name] = TokenMatcher(preprocessed_constraint.tokens)
             self.global_matchers[constraint.name] = GlobalMatcher(preprocessed_constraint)
+            self.label_triggers[constraint.name] = get_label_triggers(constraint.constraint)
+            self.feature_masks[constraint.name] = self.vocabulary.compile(get_required_features(preprocessed_constraint))
+
+    # the token field index and the feature bitmap of a sentence, to be passed to the matches of the sentence so they
+    #   aren't built again on each call. (they should be built again when nodes are added to the sentence)
+    def features(self, sentence: Sequence[BartToken], tracker: EditTracker = None) -> SentenceFeatures:
+        return SentenceFeatures(self.vocabulary, sentence, TokenFieldIndex(sentence), tracker)
 
     # apply the matching process on a given sentence
-    def __call__(self, sentence: Sequence[BartToken]) -> Match:
-        return Match(self.token_matchers, self.global_matchers, sentence)
+    # the tracker (if given) is the journal of the sentence's edits, which lets the match reuse the sentence features
+    #   between calls as long as the sentence wasn't edited
+    def __call__(self, sentence: Sequence[BartToken], tracker: EditTracker = None,
+                 features: SentenceFeatures = None) -> Match:
+        return Match(self.token_matchers, self.global_matchers, sentence, self.feature_masks, self.vocabulary, tracker,
+                     features)
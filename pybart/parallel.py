@@ -0,0 +1,219 @@
+import json
+import math
+import os
+import multiprocessing
+from collections import deque
+from itertools import islice
+from typing import NamedTuple, Any
+
+from .cache import _shift_iids
+from .conllu_wrapper import parse_conllu, serialize_conllu_sentence, iter_conllu_blocks
+from .converter import Convert, compile_conversions
+from .graph_token import CompactSentence
+
+
+# the conversion parameters (as in the api calls), shipped once to each worker
+class ConversionOptions(NamedTuple):
+    enhance_ud: bool = True
+    enhanced_plus_plus: bool = True
+    enhanced_extra: bool = True
+    conv_iterations: Any = math.inf
+    remove_eud_info: bool = False
+    remove_extra_info: bool = False
+    remove_node_adding_conversions: bool = False
+    remove_unc: bool = False
+    query_mode: bool = False
+    funcs_to_cancel: Any = None
+    ud_version: int = 1
+
+    def compile(self):
+        return compile_conversions(
+            self.enhance_ud, self.enhanced_plus_plus, self.enhanced_extra, self.remove_eud_info,
+            self.remove_node_adding_conversions, self.remove_unc, self.query_mode, self.funcs_to_cancel, self.ud_version)
+
+
+class _ConversionState(NamedTuple):
+    options: ConversionOptions
+    compiled_conversions: Any
+
+
+# each worker process initializes its conversions once, and keeps them here for all of its chunks
+_worker_state = None
+
+
+def _init_worker(options):
+    global _worker_state
+    _worker_state = _ConversionState(options, options.compile())
+
+
+def _run_in_worker(func, args, chunk):
+    return func(_worker_state, *args, chunk)
+
+
+# the per-chunk conversions. the payloads are the (compact) input and output formats themselves,
+#   so no Token graph crosses a process boundary.
+class _ConvertedConllu(NamedTuple):
+    texts: list
+    # the alternatives (iids) are numbered along the document, but each chunk starts from 0 without knowing how many
+    #   the preceding chunks used. so the number of the chunk's alternatives is returned, and so are the sentences
+    #   that have alternatives (by their index in the chunk) as CompactSentence states with their comments,
+    #   to be serialized again once that offset is known.
+    new_iids: int
+    numbered: dict
+
+
+def _convert_conllu_chunk(state, preserve_comments, eud_language, sentence_texts):
+    options = state.options
+    parsed, all_comments = parse_conllu("\n\n".join(sentence_texts))
+    con = Convert(parsed, options.enhance_ud, options.enhanced_plus_plus, options.enhanced_extra, options.conv_iterations,
+                  options.remove_eud_info, options.remove_extra_info, options.remove_node_adding_conversions,
+                  options.remove_unc, options.query_mode, options.funcs_to_cancel, options.ud_version, None,
+                  state.compiled_conversions, eud_language)
+    converted, _ = con()
+    texts = [serialize_conllu_sentence(sentence, comments, options.remove_eud_info, options.remove_extra_info, preserve_comments, eud_language)
+             for sentence, comments in zip(converted, all_comments)]
+    numbered = {i: (CompactSentence(sentence).to_state(), comments)
+                for i, (sentence, comments) in enumerate(zip(converted, all_comments))
+                if any(rel.iid is not None for token in sentence for _, rels in token.get_new_relations() for rel in rels)}
+    return _ConvertedConllu(texts, con.next_iid, numbered)
+
+
+def _convert_spike_chunk(state, graph_to_replace, eud_language, spike_sentences):
+    from .api import convert_spike_sentences
+    return list(convert_spike_sentences(spike_sentences, *state.options, graph_to_replace, state.compiled_conversions,
+                                        eud_language=eud_language))
+
+
+def _convert_spacy_chunk(state, eud_language, doc_payloads):
+    from .spacy_wrapper import parse_spacy_payload, sentence_graph_args
+    options = state.options
+    results = []
+    for doc_payload in doc_payloads:
+        # one Convert per doc, as in the calling process, so the alternatives (iids) are numbered along the doc
+        con = Convert([parse_spacy_payload(payload) for payload in doc_payload], *options, None, state.compiled_conversions, eud_language)
+        converted, convs_done = con()
+        results.append(([sentence_graph_args(sentence, options.remove_eud_info, options.remove_extra_info, eud_language) for sentence in converted],
+                        convs_done))
+    return results
+
+
+def _convert_odin_chunk(state, eud_language, odin_docs):
+    from .api import _convert_bart_odin_sent
+    return [_convert_bart_odin_sent(doc, *state.options, state.compiled_conversions, eud_language) for doc in odin_docs]
+
+
+def _convert_odin_jsonl_chunk(state, eud_language, odin_lines):
+    from .api import convert_bart_odin
+    return [json.dumps(convert_bart_odin(json.loads(odin_line), *state.options, state.compiled_conversions,
+                                         eud_language=eud_language))
+            for odin_line in odin_lines]
+
+
+def _chunked(iterable, chunk_size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+
+class ParallelConverter:
+    """Converts a corpus over a pool of worker processes.
+
+    The input is read lazily in chunks of chunk_size sentences (or documents for Odin), and only a bounded number of
+    chunks is in flight at once, so the memory doesn't grow with the size of the corpus.
+    The results are returned in the input order. With workers <= 1 the conversion runs in the calling process.
+
+    Use it as a context manager (or call close) to shut the workers down.
+    """
+    def __init__(self, workers=None, chunk_size=64, enhance_ud=True, enhanced_plus_plus=True, enhanced_extra=True, conv_iterations=math.inf, remove_eud_info=False, remove_extra_info=False, remove_node_adding_conversions=False, remove_unc=False, query_mode=False, funcs_to_cancel=None, ud_version=1, mp_context=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunk_size = chunk_size
+        # enough chunks to keep all the workers busy while the results are consumed in order
+        self.max_pending = 2 * max(self.workers, 1)
+        self.options = ConversionOptions(enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version)
+        self.mp_context = mp_context
+        self._pool = None
+        self._local_state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _map(self, func, args, units):
+        if self.workers <= 1:
+            if self._local_state is None:
+                self._local_state = _ConversionState(self.options, self.options.compile())
+            for chunk in _chunked(units, self.chunk_size):
+                yield func(self._local_state, *args, chunk)
+            return
+
+        if self._pool is None:
+            context = multiprocessing.get_context(self.mp_context)
+            self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.options,))
+        pending = deque()
+        for chunk in _chunked(units, self.chunk_size):
+            pending.append(self._pool.apply_async(_run_in_worker, (func, args, chunk)))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def _iter_conllu_texts(self, conllu_lines, preserve_comments, eud_language):
+        # the converted text of each sentence in order, with the alternatives numbered along the entire input
+        options = self.options
+        iids_offset = 0
+        for chunk in self._map(_convert_conllu_chunk, (preserve_comments, eud_language), iter_conllu_blocks(conllu_lines)):
+            for i, text in enumerate(chunk.texts):
+                if iids_offset and i in chunk.numbered:
+                    sentence_state, comments = chunk.numbered[i]
+                    sentence = CompactSentence.from_state(_shift_iids(sentence_state, iids_offset)).to_tokens()
+                    text = serialize_conllu_sentence(sentence, comments, options.remove_eud_info, options.remove_extra_info, preserve_comments, eud_language)
+                yield text
+            iids_offset += chunk.new_iids
+
+    def convert_conllu_stream(self, conllu_lines, output, preserve_comments=False, eud_language=None):
+        # reads CoNLL-U lines (e.g. an open file) and writes the converted text to the output stream,
+        #   the same text api.convert_bart_conllu would have returned. returns the number of converted sentences.
+        count = 0
+        for text in self._iter_conllu_texts(conllu_lines, preserve_comments, eud_language):
+            if count:
+                output.write("\n")
+            output.write(text)
+            count += 1
+        return count
+
+    def convert_conllu(self, conllu_text, preserve_comments=False, eud_language=None):
+        return "\n".join(self._iter_conllu_texts(conllu_text.splitlines(), preserve_comments, eud_language))
+
+    def iter_convert_spike_sentences(self, spike_sentences, graph_to_replace="universal-enhanced", eud_language=None):
+        # yields the converted SPIKE sentences (as in api.convert_spike_sentence) in order
+        for converted in self._map(_convert_spike_chunk, (graph_to_replace, eud_language), spike_sentences):
+            yield from converted
+
+    def iter_convert_spacy_docs(self, doc_payloads, eud_language=None):
+        # yields the graphs of the sentences (as in spacy_wrapper.sentence_graph_args) and the number of conversion
+        #   iterations of each spaCy doc payload (see spacy_wrapper.spacy_doc_payload) in order
+        for converted in self._map(_convert_spacy_chunk, (eud_language,), doc_payloads):
+            yield from converted
+
+    def iter_convert_odin_documents(self, odin_docs, eud_language=None):
+        # yields the converted Odin documents (as in api.convert_bart_odin) in order
+        for converted in self._map(_convert_odin_chunk, (eud_language,), odin_docs):
+            yield from converted
+
+    def iter_convert_odin_jsonl(self, odin_lines, eud_language=None):
+        # yields the converted json (as in api.convert_bart_odin) of each non-blank JSON line in order.
+        #   the lines themselves are the payloads, so the parsing and dumping happen in the workers as well.
+        for converted in self._map(_convert_odin_jsonl_chunk, (eud_language,), (line for line in odin_lines if line.strip())):
+            yield from converted
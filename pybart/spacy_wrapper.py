@@ -1,12 +1,13 @@
+import math
 import struct
 from typing import Any, Dict
-import os
-import sys
 
+from spacy.language import Language
 from spacy.tokens import Doc, Token as SpacyToken
 from spacy.tokens.graph import Graph
 
 from .graph_token import Token, add_basic_edges, TokenId
+from .api import Converter
 
 JsonObject = Dict[str, Any]
 
@@ -14,6 +15,9 @@ JsonObject = Dict[str, Any]
 # this is here because it needs to happen only once (per import)
 Doc.set_extension("parent_graphs_per_sent", default=[])
 Doc.set_extension("added_nodes", default=[])
+# the results of the pipeline component are kept per doc
+Doc.set_extension("pybart_converted_sents", default=None)
+Doc.set_extension("pybart_max_convs", default=None)
 
 
 def get_pybart(doc):
@@ -53,16 +57,24 @@ def enhance_spike_doc(doc: Doc, spike_doc: JsonObject) -> JsonObject:
 Doc.set_extension("enhance_spike_doc", method=enhance_spike_doc)
 
 
-def parse_spacy_sent(sent):
-    sentence = []
-
+def spacy_sent_payload(sent):
+    # the fields of a spaCy sentence that the conversion needs, as plain (picklable) lists
     offset = min(tok.i for tok in sent)
+    return ([tok.text for tok in sent], [tok.lemma_ for tok in sent], [tok.pos_ for tok in sent],
+            [tok.tag_ for tok in sent], [(tok.head.i + 1 - offset) if tok.head.i != tok.i else 0 for tok in sent],
+            [tok.dep_.lower() for tok in sent])
+
+
+def spacy_doc_payload(doc):
+    return [spacy_sent_payload(sent) for sent in doc.sents]
+
+
+def parse_spacy_payload(payload):
+    sentence = []
     
-    for i, tok in enumerate(sent):
+    for i, (form, lemma, upos, xpos, head, deprel) in enumerate(zip(*payload)):
         # add current token to current sentence
-        sentence.append(Token(
-            TokenId(tok.i + 1 - offset), tok.text, tok.lemma_, tok.pos_, tok.tag_, "_",
-            TokenId((tok.head.i + 1 - offset) if tok.head.i != tok.i else 0), tok.dep_.lower(), "_", "_"))
+        sentence.append(Token(TokenId(i + 1), form, lemma, upos, xpos, "_", TokenId(head), deprel, "_", "_"))
     
     # add root
     sentence.append(Token(TokenId(0), None, None, None, None, None, None, None, None, None))
@@ -74,36 +86,61 @@ def parse_spacy_sent(sent):
     return sentence
 
 
-def enhance_to_spacy_doc(orig_doc, converted_sentences, remove_enhanced_extra_info, remove_bart_extra_info):
-    for sent_idx, (orig_span, converted_sentence) in enumerate(zip(orig_doc.sents, converted_sentences)):
-        added_counter = 0
-        node_indices_map = dict()
-        nodes = []
-        edges = []
-        labels = []
-        orig_doc._.added_nodes.append(dict())
-        converted_sentence = [tok for tok in converted_sentence if tok.get_conllu_field("id") != '0']
-        for idx, tok in enumerate(converted_sentence):
-            new_id = tok.get_conllu_field("id")
-            node_indices_map[new_id.token_str] = idx
-            _ = nodes.append((idx,))
-            if new_id.minor != 0:
-                orig_doc._.added_nodes[sent_idx][idx] = tok.get_conllu_field("form") + (f"_{added_counter}" if tok.get_conllu_field("form") == "STATE" else f"[COPY_NODE_{added_counter}]")
-                added_counter += 1
-        for tok in converted_sentence:
-            new_id = tok.get_conllu_field("id").token_str
-            for head, rels in tok.get_new_relations():
-                for rel in rels:
-                    head_id = head.get_conllu_field("id").token_str
-                    edges.append((
-                        node_indices_map[head_id if head_id != '0' else new_id],
-                        node_indices_map[new_id]
-                    ))
-                    _ = orig_doc.vocab[rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info)]  # this will push the label into the vocab if it's not there
-                    labels.append(rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info))
-
-        # Disable printing possibility: so graph creation wont print many lines
-        sys.stdout = open(os.devnull, 'w')
-        orig_doc._.parent_graphs_per_sent.append(Graph(orig_doc, name="pybart", nodes=nodes, edges=edges, labels=labels))
-        # Restore printing possibility
-        sys.stdout = sys.__stdout__
+def parse_spacy_sent(sent):
+    return parse_spacy_payload(spacy_sent_payload(sent))
+
+
+def sentence_graph_args(converted_sentence, remove_enhanced_extra_info, remove_bart_extra_info, eud_language=None):
+    # the nodes, edges and labels of the graph of a converted sentence, and the names of its added nodes
+    #   (all plain data, so it can be computed in another process)
+    added_counter = 0
+    node_indices_map = dict()
+    nodes = []
+    edges = []
+    labels = []
+    added_nodes = dict()
+    converted_sentence = [tok for tok in converted_sentence if tok.get_conllu_field("id") != '0']
+    for idx, tok in enumerate(converted_sentence):
+        new_id = tok.get_conllu_field("id")
+        node_indices_map[new_id.token_str] = idx
+        nodes.append((idx,))
+        if new_id.minor != 0:
+            added_nodes[idx] = tok.get_conllu_field("form") + (f"_{added_counter}" if tok.get_conllu_field("form") == "STATE" else f"[COPY_NODE_{added_counter}]")
+            added_counter += 1
+    for tok in converted_sentence:
+        new_id = tok.get_conllu_field("id").token_str
+        for head, rels in tok.get_new_relations():
+            for rel in rels:
+                head_id = head.get_conllu_field("id").token_str
+                edges.append((
+                    node_indices_map[head_id if head_id != '0' else new_id],
+                    node_indices_map[new_id]
+                ))
+                labels.append(rel.to_str(remove_enhanced_extra_info, remove_bart_extra_info, eud_language))
+    return nodes, edges, labels, added_nodes
+
+
+def attach_graphs(orig_doc, graphs_args):
+    # builds the graphs of all the sentences of the doc in one batch.
+    #   (nothing here touches a process-wide state such as sys.stdout, so this can run from several threads)
+    # push the labels into the vocab if they are not there
+    for label in dict.fromkeys(label for _, _, labels, _ in graphs_args for label in labels):
+        _ = orig_doc.vocab[label]
+    # assign new lists rather than appending, so the shared (default) lists of the extensions are never modified
+    orig_doc._.added_nodes = orig_doc._.added_nodes + [added_nodes for _, _, _, added_nodes in graphs_args]
+    orig_doc._.parent_graphs_per_sent = orig_doc._.parent_graphs_per_sent + \
+        [Graph(orig_doc, name="pybart", nodes=nodes, edges=edges, labels=labels) for nodes, edges, labels, _ in graphs_args]
+
+
+def enhance_to_spacy_doc(orig_doc, converted_sentences, remove_enhanced_extra_info, remove_bart_extra_info, eud_language=None):
+    attach_graphs(orig_doc, [sentence_graph_args(converted_sentence, remove_enhanced_extra_info, remove_bart_extra_info, eud_language)
+                             for _, converted_sentence in zip(orig_doc.sents, converted_sentences)])
+
+
+# registered on import, see api.__getattr__
+@Language.factory(
+   "pybart_spacy_pipe",
+   default_config={"enhance_ud": True, "enhanced_plus_plus": True, "enhanced_extra": True, "conv_iterations": math.inf, "remove_eud_info": False, "remove_extra_info": False, "remove_node_adding_conversions": False, "remove_unc": False, "query_mode": False, "funcs_to_cancel": None, "ud_version": 1, "eud_language": None, "n_process": 1},
+)
+def create_pybart_spacy_pipe(nlp, name, enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, eud_language, n_process):
+    return Converter(enhance_ud, enhanced_plus_plus, enhanced_extra, conv_iterations, remove_eud_info, remove_extra_info, remove_node_adding_conversions, remove_unc, query_mode, funcs_to_cancel, ud_version, eud_language=eud_language, n_process=n_process)
@@ -0,0 +1,141 @@
+import json
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class ConversionCounters:
+    runs: int = 0
+    # the runs that were skipped, as nothing that its matches depend on was edited since its last run
+    skipped: int = 0
+    matches: int = 0
+    match_seconds: float = 0.0
+    transformation_seconds: float = 0.0
+    edges_added: int = 0
+    edges_removed: int = 0
+
+
+class ConversionStats:
+    """Opt-in instrumentation of the conversion process.
+
+    Pass an instance to the convert calls (or to Convert, as its stats argument) to accumulate, over all the converted
+    sentences: per conversion, the time spent matching and transforming, the number of matches and the edges added
+    and removed; the fixpoint iterations per sentence; and the time spent running the matcher and checking
+    for changes (changed_since, which replaced the snapshotting get_rel_set).
+    When no instance is given nothing is measured.
+
+    The optional on_sentence callback is called after each sentence with its number of tokens, its number of
+    iterations and its conversion time in seconds.
+    """
+    def __init__(self, on_sentence=None):
+        self.on_sentence = on_sentence
+        self.reset()
+
+    def reset(self):
+        self.conversions = defaultdict(ConversionCounters)
+        self.sentences = 0
+        self.tokens = 0
+        self.seconds = 0.0
+        # number of sentences per number of iterations
+        self.iterations = Counter()
+        self.matcher_calls = 0
+        self.matcher_seconds = 0.0
+        self.changed_since_calls = 0
+        self.changed_since_seconds = 0.0
+
+    def _timed_matches(self, counters, matches):
+        # the matches are generated lazily while the transformation consumes them, so the time is taken per match
+        while True:
+            start = time.perf_counter()
+            try:
+                match = next(matches)
+            except StopIteration:
+                counters.match_seconds += time.perf_counter() - start
+                return
+            counters.match_seconds += time.perf_counter() - start
+            counters.matches += 1
+            yield match
+
+    def run_transformation(self, conv_name, conversion, sentence, matches, converter, tracker):
+        counters = self.conversions[conv_name]
+        counters.runs += 1
+        version = tracker.version
+        match_seconds = counters.match_seconds
+        start = time.perf_counter()
+        conversion.transformation(sentence, self._timed_matches(counters, matches), converter)
+        counters.transformation_seconds += time.perf_counter() - start - (counters.match_seconds - match_seconds)
+        for edit in tracker.edits_since(version):
+            if edit.added:
+                counters.edges_added += 1
+            else:
+                counters.edges_removed += 1
+
+    def skip(self, conv_name):
+        self.conversions[conv_name].skipped += 1
+
+    def run_matcher(self, matcher, sentence, tracker=None, features=None):
+        start = time.perf_counter()
+        m = matcher(sentence, tracker, features)
+        self.matcher_seconds += time.perf_counter() - start
+        self.matcher_calls += 1
+        return m
+
+    def changed_since(self, converter, tracker, version):
+        start = time.perf_counter()
+        changed = converter.changed_since(tracker, version)
+        self.changed_since_seconds += time.perf_counter() - start
+        self.changed_since_calls += 1
+        return changed
+
+    def add_sentence(self, tokens, iterations, seconds):
+        self.sentences += 1
+        self.tokens += tokens
+        self.iterations[iterations] += 1
+        self.seconds += seconds
+        if self.on_sentence is not None:
+            self.on_sentence(tokens, iterations, seconds)
+
+    def to_dict(self):
+        return {
+            "sentences": self.sentences,
+            "tokens": self.tokens,
+            "seconds": self.seconds,
+            "iterations": {str(iterations): count for iterations, count in sorted(self.iterations.items())},
+            "matcher": {"calls": self.matcher_calls, "seconds": self.matcher_seconds},
+            "changed_since": {"calls": self.changed_since_calls, "seconds": self.changed_since_seconds},
+            "conversions": {conv_name: asdict(counters) for conv_name, counters in sorted(self.conversions.items())},
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="pybart"):
+        # the Prometheus text exposition format, the timings as counters of seconds
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+        metric("sentences_total", "counter", "Converted sentences.", [({}, self.sentences)])
+        metric("tokens_total", "counter", "Tokens of the converted sentences.", [({}, self.tokens)])
+        metric("conversion_seconds_total", "counter", "Time spent converting sentences.", [({}, self.seconds)])
+        metric("sentence_iterations", "gauge", "Sentences per number of fixpoint iterations.",
+               [({"iterations": iterations}, count) for iterations, count in sorted(self.iterations.items())])
+        metric("matcher_seconds_total", "counter", "Time spent running the matcher on sentences.", [({}, self.matcher_seconds)])
+        metric("changed_since_seconds_total", "counter", "Time spent checking sentences for changes.", [({}, self.changed_since_seconds)])
+        for field, kind, help_text in [
+                ("runs", "counter", "Runs of the conversion."),
+                ("skipped", "counter", "Runs of the conversion skipped as nothing it depends on changed."),
+                ("matches", "counter", "Matches of the conversion."),
+                ("match_seconds", "counter", "Time spent matching the conversion."),
+                ("transformation_seconds", "counter", "Time spent transforming the matches of the conversion."),
+                ("edges_added", "counter", "Edges added by the conversion."),
+                ("edges_removed", "counter", "Edges removed by the conversion.")]:
+            metric(f"conversion_{field}_total", kind, help_text,
+                   [({"conversion": conv_name}, getattr(counters, field)) for conv_name, counters in sorted(self.conversions.items())])
+        return "\n".join(lines) + "\n"
@@ -14,6 +14,9 @@ setuptools.setup(
     url="https://github.com/allenai/pybart",
     packages=setuptools.find_packages(),
     package_data={'pybart': ['constants/eud_literal_allowed_list_en.json', 'constants/eud_literal_allowed_list_he.json']},
+    # spaCy is needed only for the pipeline component, which spaCy finds (and registers) through this entry point
+    extras_require={"spacy": ["spacy>=3.0.0,<=4.0.0"]},
+    entry_points={"spacy_factories": ["pybart_spacy_pipe = pybart.spacy_wrapper:create_pybart_spacy_pipe"]},
     classifiers=[
         "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: Apache Software License",
@@ -1,13 +1,22 @@
+import io
+import json
+import os
 import pathlib
 import math
+import subprocess
+import sys
 #from pytest import fail
 
 import pybart
-from pybart.conllu_wrapper import parse_conllu, serialize_conllu
+from pybart.conllu_wrapper import parse_conllu, parse_odin, serialize_conllu
 from pybart import converter
 from pybart import api
-from pybart.graph_token import add_basic_edges
-from pybart.converter import Convert
+from pybart.graph_token import add_basic_edges, CompactSentence, EditTracker, Label, Token, TokenId
+from pybart.converter import Convert, Conversion, ConvTypes
+from pybart.constraints import Full, Token as TokenConstraint, Edge, HasLabelFromList
+from pybart.matcher import Matcher, NamedConstraint
+from pybart.constants.constants import get_eud_literal_allowed_set
+from pybart.parallel import ParallelConverter
 
 
 class TestConversions:
@@ -81,6 +90,558 @@ class TestConversions:
     def test_no_node_adding(self):
         self.common_logic_combined("test_combined_no_node_adding", rnac=True)
 
+    def test_shared_compiled_conversions(self):
+        dir_ = str(pathlib.Path(__file__).parent.absolute())
+        with open(dir_ + "/handcrafted_tests.conllu") as f:
+            text = f.read()
+        compiled = api.compile_conversions()
+        # the same compiled matcher is reused across calls and sentences, and must give the same output
+        assert api.convert_bart_conllu(text, compiled_conversions=compiled) == api.convert_bart_conllu(text)
+        assert api.convert_bart_conllu(text, compiled_conversions=compiled) == api.convert_bart_conllu(text)
+
+    def test_conllu_stream(self):
+        dir_ = str(pathlib.Path(__file__).parent.absolute())
+        with open(dir_ + "/handcrafted_tests.conllu") as f:
+            text = f.read()
+        # streaming gives the same text as the in-memory conversion, comments included
+        for preserve_comments in [True, False]:
+            out = io.StringIO()
+            with open(dir_ + "/handcrafted_tests.conllu") as f:
+                count = api.convert_bart_conllu_stream(f, out, preserve_comments=preserve_comments)
+            assert count == len(parse_conllu(text)[0])
+            # the alternatives (the "#N" of the labels) are numbered along the stream as they are along the document
+            assert out.getvalue() == api.convert_bart_conllu(text, preserve_comments=preserve_comments)
+        assert "#1" in out.getvalue()
+
+        # the sentences are read only as they are consumed
+        lines = iter(text.splitlines(keepends=True))
+        next(api.iter_convert_bart_conllu(lines))
+        assert next(lines, None) is not None
+
+    def test_conllu_stream_state(self):
+        dir_ = str(pathlib.Path(__file__).parent.absolute())
+        with open(dir_ + "/handcrafted_tests.conllu") as f:
+            text = f.read()
+        copies = 5
+        con = Convert([], True, True, True, math.inf, False, False, False, False, False, None)
+        per_copy = None
+        for copy in range(copies):
+            for sentence in parse_conllu(text)[0]:
+                con.convert_more([sentence])
+                # nothing of the converted sentence is held on to, only the next free alternative id
+                assert not con.iids and not con.cc_assignments
+            if per_copy is None:
+                per_copy = con.next_iid
+            assert con.next_iid == per_copy * (copy + 1)
+        assert per_copy > 0
+
+    def test_parallel_converter(self):
+        dir_ = str(pathlib.Path(__file__).parent.absolute())
+        with open(dir_ + "/handcrafted_tests.conllu") as f:
+            text = f.read()
+        # twice over, so the alternatives (the "#N" of the labels) of the second copy continue those of the first
+        text = text.strip() + "\n\n" + text
+        expected = api.convert_bart_conllu(text, preserve_comments=True)
+        assert "#1" in expected
+        # in process, and over a pool with chunks that don't divide the corpus evenly, the output keeps the input order.
+        #   chunks of a single sentence have a boundary after each of the sentences with alternatives.
+        for workers, chunk_size in [(1, 7), (2, 7), (2, 1)]:
+            with ParallelConverter(workers=workers, chunk_size=chunk_size) as parallel_converter:
+                assert parallel_converter.convert_conllu(text, preserve_comments=True) == expected
+                out = io.StringIO()
+                count = parallel_converter.convert_conllu_stream(text.splitlines(keepends=True), out, preserve_comments=True)
+                assert count == len(parse_conllu(text)[0])
+                assert out.getvalue() == expected
+
+        # the eud language is passed on to the workers
+        expected_he = api.convert_bart_conllu(text, preserve_comments=True, eud_language="he")
+        assert expected_he != expected
+        with ParallelConverter(workers=2, chunk_size=7) as parallel_converter:
+            assert parallel_converter.convert_conllu(text, preserve_comments=True, eud_language="he") == expected_he
+
+    def test_compact_sentence(self):
+        dir_ = str(pathlib.Path(__file__).parent.absolute())
+        with open(dir_ + "/handcrafted_tests.conllu") as f:
+            text = f.read()
+        expected = api.convert_bart_conllu(text)
+
+        # converting restored sentences gives the same output
+        parsed, all_comments = parse_conllu(text)
+        restored = [CompactSentence(sentence).to_tokens() for sentence in parsed]
+        converted, _ = Convert(restored, True, True, True, math.inf, False, False, False, False, False, None)()
+        assert serialize_conllu(converted, all_comments, False, False) == expected
+
+        # and so does restoring converted sentences (that point at a root which isn't in the list)
+        compact = [CompactSentence(sentence) for sentence in converted]
+        assert serialize_conllu([sentence.to_tokens() for sentence in compact], all_comments, False, False) == expected
+        # each sentence holds a table of just its own distinct labels
+        assert all(list(sentence.labels) == list(dict.fromkeys(rel for token in tokens for _, rels in token.get_new_relations() for rel in rels))
+                   for sentence, tokens in zip(compact, converted))
+        assert serialize_conllu([CompactSentence.from_state(sentence.to_state()).to_tokens() for sentence in compact], all_comments, False, False) == expected
+        # and the converted tokens don't keep the journal of their edits
+        assert all(token.get_edit_log() == [] for sentence in converted for token in sentence)
+
+
+def test_label_interning():
+    label = Label("nmod", "not_an_allowed_eud", src="conj", phrase="and")
+    assert label is Label("nmod", eud="not_an_allowed_eud", src="conj", phrase="and")
+    assert {label: 1}[Label("nmod", "not_an_allowed_eud", "conj", None, "and")] == 1
+    assert label.to_str(False, True) == "nmod:_other"
+    # serializing doesn't change the label
+    assert label.eud == "not_an_allowed_eud" and label is not Label("nmod", "_other", src="conj", phrase="and")
+    assert label.to_str(False, False) == "nmod:_other@conj(and)"
+    assert label.to_str(True, True) == "nmod"
+    # the allow-list is per language
+    hebrew_eud = sorted(get_eud_literal_allowed_set("he") - get_eud_literal_allowed_set("en"))[0]
+    hebrew_label = Label("nmod", hebrew_eud)
+    assert hebrew_label.to_str(False, True) == hebrew_label.to_str(False, True, "he") == "nmod:" + hebrew_eud
+    assert hebrew_label.to_str(False, True, "en") == "nmod:_other"
+    try:
+        label.eud = "of"
+        assert False
+    except AttributeError:
+        pass
+
+
+def test_label_intern_table():
+    import gc
+    from concurrent.futures import ThreadPoolExecutor
+    # the labels that aren't used anymore are dropped from the table
+    gc.collect()
+    size = len(Label._interned)
+    labels = [Label("nmod", "of", src="conj", phrase=f"phrase{i}", iid=i) for i in range(1000)]
+    assert len(Label._interned) == size + 1000
+    del labels
+    gc.collect()
+    assert len(Label._interned) == size
+    # equal labels constructed concurrently are the same object
+    with ThreadPoolExecutor(8) as pool:
+        labels = list(pool.map(lambda i: Label("nsubj", src="advcl", phrase="while", iid=i % 10), range(10000)))
+    assert all(label is Label("nsubj", src="advcl", phrase="while", iid=i % 10) for i, label in enumerate(labels))
+
+
+def test_edge_store_keeps_insertion_order():
+    head = Token(TokenId(1), "and", "and", "_", "CC", "_", None, "_", "_", "_")
+    children = [Token(TokenId(i + 2), "w", "w", "_", "NN", "_", None, "_", "_", "_") for i in range(6)]
+    for child in children:
+        child.add_edge(Label("conj"), head)
+        child.add_edge(Label("conj"), head)  # already there, so nothing changes
+    for child in children[1::2]:
+        child.remove_edge(Label("conj"), head)
+    children[1].add_edge(Label("conj"), head)
+    assert list(head.get_children()) == [children[0], children[2], children[4], children[1]]
+    assert all(rels == [Label("conj")] for _, rels in head.get_children_with_rels())
+
+
+def make_toy_sentence():
+    # "He went home", with its basic edges
+    tokens = [Token(TokenId(1), "He", "he", "_", "PRP", "_", TokenId(2), "nsubj", "_", "_"),
+              Token(TokenId(2), "went", "go", "_", "VBD", "_", TokenId(0), "root", "_", "_"),
+              Token(TokenId(3), "home", "home", "_", "RB", "_", TokenId(2), "advmod", "_", "_"),
+              Token(TokenId(0), None, None, None, None, None, None, None, None, None)]
+    add_basic_edges(tokens)
+    return tokens[:-1]
+
+
+def toy_edge_constraint(label):
+    return Full(tokens=[TokenConstraint(id="dep"), TokenConstraint(id="gov")],
+                edges=[Edge(child="dep", parent="gov", label=[HasLabelFromList([label])])])
+
+
+# extra_toy_a depends on nsubj edges and adds "a" edges, extra_toy_b depends on the "a" edges and adds an nsubj edge
+#   (which extra_toy_a then depends on), and extra_toy_c depends on advmod edges, which nothing edits
+def extra_toy_a(sentence, matches, converter):
+    for cur_match in matches:
+        sentence[cur_match.token("dep")].add_edge(Label("a"), sentence[cur_match.token("gov")])
+
+
+def extra_toy_b(sentence, matches, converter):
+    for cur_match in matches:
+        sentence[2].add_edge(Label("nsubj"), sentence[cur_match.token("gov")])
+
+
+def extra_toy_c(sentence, matches, converter):
+    for _ in matches:
+        pass
+
+
+def convert_toy_sentence(sentence, transformations, conv_iterations=math.inf):
+    from pybart.stats import ConversionStats
+    conversions = {conversion.name: conversion for conversion in
+                   (Conversion(ConvTypes.BART, toy_edge_constraint(label), transformation) for label, transformation in transformations)}
+    matcher = Matcher([NamedConstraint(conv_name, conversion.constraint) for conv_name, conversion in conversions.items()])
+    stats = ConversionStats()
+    con = Convert([], True, True, True, conv_iterations, False, False, False, False, False, None, 1, None, None, None, stats)
+    return con.convert_sentence(sentence, conversions, conv_iterations, matcher), stats
+
+
+TOY_TRANSFORMATIONS = [("nsubj", extra_toy_a), ("a", extra_toy_b), ("advmod", extra_toy_c)]
+
+
+def test_edit_log():
+    tracker = EditTracker()
+    head, child = make_toy_sentence()[1:3]
+    child.set_tracker(tracker)
+    child.add_edge(Label("dobj"), head)
+    child.add_edge(Label("dobj"), head)  # already there, so it isn't journaled
+    child.remove_edge(Label("dobj"), head)
+    child.remove_edge(Label("dobj"), head)  # already gone
+    assert child.get_edit_log() == [(True, child, head, Label("dobj"), 1), (False, child, head, Label("dobj"), 2)]
+    assert tracker.touched_since(1) == [child, head] and tracker.edits_since(1) == tracker.log[1:]
+    # the edits are journaled by the child's tracker, the head wasn't given one
+    assert head.get_edit_log() == []
+
+
+def test_incremental_rerun():
+    sentence = make_toy_sentence()
+    _, stats = convert_toy_sentence(sentence, TOY_TRANSFORMATIONS)
+    # extra_toy_c is skipped once it ran, as no advmod edge is ever edited, while the others re-run once
+    #   after an edit of a label they depend on, and are skipped on the last iteration that changes nothing
+    assert {conv_name: (counters.runs, counters.skipped) for conv_name, counters in stats.conversions.items()} == \
+        {"extra_toy_a": (2, 1), "extra_toy_b": (2, 1), "extra_toy_c": (1, 2)}
+    he, went, home = sentence
+    assert he.get_new_relations(went) == [(went, [Label("nsubj"), Label("a")])]
+    assert home.get_new_relations(went) == [(went, [Label("advmod"), Label("nsubj"), Label("a")])]
+
+
+def extra_toy_flip(sentence, matches, converter):
+    # removes and re-adds the edge, so it always matches but never changes the graph
+    for cur_match in matches:
+        dep, gov = sentence[cur_match.token("dep")], sentence[cur_match.token("gov")]
+        dep.remove_edge(Label("advmod"), gov)
+        dep.add_edge(Label("advmod"), gov)
+
+
+def test_convergence():
+    # the fixpoint takes an iteration per chain of dependent edits, and the one that changes nothing ends it
+    sentence = make_toy_sentence()
+    assert convert_toy_sentence(sentence, TOY_TRANSFORMATIONS)[0] == 2
+    assert [rel for rels in (rels for _, rels in sentence[2].get_new_relations()) for rel in rels] == \
+        [Label("advmod"), Label("nsubj"), Label("a")]
+    # with fewer allowed iterations it stops before the fixpoint
+    sentence = make_toy_sentence()
+    assert convert_toy_sentence(sentence, TOY_TRANSFORMATIONS, conv_iterations=1)[0] == 1
+    assert Label("a") not in sentence[2].get_new_relations(sentence[1])[0][1]
+
+    # edits that cancel out within an iteration aren't a change, so this terminates at once
+    sentence = make_toy_sentence()
+    iterations, stats = convert_toy_sentence(sentence, [("advmod", extra_toy_flip)], conv_iterations=100)
+    assert iterations == 0 and stats.conversions["extra_toy_flip"].edges_added == 1
+
+
+def test_changed_since():
+    sentence = make_toy_sentence()
+    tracker = EditTracker()
+    _ = [tok.set_tracker(tracker) for tok in sentence]
+    con = Convert([], True, True, True, math.inf, False, False, False, False, False, None)
+    he, went, _ = sentence
+    he.replace_edge(Label("nsubj"), Label("nsubj", "not_an_allowed_eud"), went, went)
+    assert con.changed_since(tracker, 0)
+    version = tracker.version
+    # both euds serialize as "_other", so swapping them isn't a change
+    he.replace_edge(Label("nsubj", "not_an_allowed_eud"), Label("nsubj", "another_one"), went, went)
+    assert not con.changed_since(tracker, version)
+    assert con.changed_since(tracker, 0)
+
+
+def test_remove_all_edges():
+    heads = [Token(TokenId(i + 1), "w", "w", "_", "NN", "_", None, "_", "_", "_") for i in range(2)]
+    child = Token(TokenId(3), "w", "w", "_", "NN", "_", None, "_", "_", "_")
+    for head in heads:
+        for label in ["nmod", "obj", "conj", "dep"]:
+            child.add_edge(Label(label), head)
+    child.remove_all_edges()
+    # every label is removed, not only every other label of each head
+    assert list(child.get_new_relations()) == []
+    assert all(list(head.get_children()) == [] for head in heads)
+
+
+def run_fresh_interpreter(code):
+    # spaCy is already imported by this interpreter
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          cwd=str(pathlib.Path(__file__).parent.parent.absolute())).stdout.split()
+
+
+def test_import_without_spacy():
+    code = "import sys, time\n" \
+           "start = time.perf_counter()\n" \
+           "from pybart.api import convert_bart_conllu, convert_bart_odin, convert_spike_sentence, convert_bart_tacred\n" \
+           "import pybart.parallel\n" \
+           "api_time = time.perf_counter() - start\n" \
+           "print('spacy' in sys.modules)\n" \
+           "start = time.perf_counter()\n" \
+           "import spacy\n" \
+           "spacy_time = time.perf_counter() - start\n" \
+           "from pybart.api import *\n" \
+           "print(spacy.registry.factories.get('pybart_spacy_pipe') is create_pybart_spacy_pipe)\n" \
+           "print(api_time, spacy_time)\n"
+    # the non-spaCy api doesn't import spaCy, and the pipeline component is still registered on demand
+    imported_spacy, registered, api_time, spacy_time = run_fresh_interpreter(code)
+    assert (imported_spacy, registered) == ("False", "True")
+    # so importing the api takes a fraction of the time spaCy alone takes to import
+    assert float(api_time) * 2 < float(spacy_time)
+
+
+def test_star_import_without_spacy_installed():
+    # a None entry in sys.modules makes spaCy look uninstalled
+    code = "import sys\n" \
+           "sys.modules['spacy'] = None\n" \
+           "from pybart.api import *\n" \
+           "print('create_pybart_spacy_pipe' in dir(), convert_bart_conllu.__name__)\n"
+    assert run_fresh_interpreter(code) == ["False", "convert_bart_conllu"]
+
+
+def make_spacy_doc(copies=1):
+    import spacy
+    from spacy.tokens import Doc
+    # "He saw me while driving. They left.", with the first sentence repeated the given number of times
+    heads = [h + 6 * i for i in range(copies) for h in [1, 1, 1, 4, 1, 1]] + [h + 6 * copies for h in [1, 1, 1]]
+    return Doc(spacy.blank("en").vocab, words=["He", "saw", "me", "while", "driving", "."] * copies + ["They", "left", "."],
+               heads=heads, deps=["nsubj", "ROOT", "dobj", "mark", "advcl", "punct"] * copies + ["nsubj", "ROOT", "punct"],
+               tags=["PRP", "VBD", "PRP", "IN", "VBG", "."] * copies + ["PRP", "VBD", "."],
+               lemmas=["he", "see", "I", "while", "drive", "."] * copies + ["they", "leave", "."])
+
+
+def test_spacy_graphs_without_stdout_swapping():
+    def open_fds():
+        return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else 0
+
+    import pybart.spacy_wrapper  # registers the Doc extensions
+    compiled = api.compile_conversions()
+    stdout = sys.stdout
+    fds = open_fds()
+    for _ in range(50):
+        doc = make_spacy_doc()
+        doc._.parent_graphs_per_sent = []
+        doc._.added_nodes = []
+        api.convert_spacy_doc(doc, remove_extra_info=True, compiled_conversions=compiled)
+    # no file descriptor is leaked per sentence, and the process-wide stdout is left alone
+    assert open_fds() == fds
+    assert sys.stdout is stdout
+    edges = doc._.get_pybart()
+    assert len(edges) == 2
+    assert {(str(edge["head"]), edge["label"], str(edge["tail"])) for edge in edges[0]} >= \
+           {("saw", "nsubj", "He"), ("saw", "advcl:while", "driving"), ("driving", "nsubj", "He")}
+
+
+def test_spacy_pipe():
+    import pybart.spacy_wrapper  # registers the Doc extensions
+
+    def edges(doc):
+        return [[(str(edge["head"]), edge["label"], str(edge["tail"])) for edge in sent] for sent in doc._.get_pybart()]
+
+    # with the default flags, and with two sentences that have alternatives (the "#N" of the labels),
+    #   which are numbered along each doc
+    converter = api.Converter()
+    expected = edges(converter(make_spacy_doc(copies=2)))
+    assert any(label.endswith("#1") for sent in expected for _, label, _ in sent)
+    # the results are kept per doc, and the graphs of one doc don't leak into another
+    for n_process in [1, 2]:
+        docs = list(converter.pipe((make_spacy_doc(copies=2) for _ in range(5)), batch_size=2, n_process=n_process))
+        assert all(edges(doc) == expected for doc in docs)
+        assert all(doc._.pybart_max_convs > 0 for doc in docs)
+        assert all((doc._.pybart_converted_sents is None) == (n_process > 1) for doc in docs)
+    converter.close()
+
+
+def make_spike_sentences():
+    dir_ = str(pathlib.Path(__file__).parent.absolute())
+    with open(dir_ + "/handcrafted_tests.conllu") as f:
+        parsed, _ = parse_conllu(f.read())
+    spike_sentences = []
+    for sentence in parsed:
+        tokens = [tok for tok in sentence if tok.get_conllu_field("id").major != 0]
+        spike_sentences.append({
+            "words": [tok.get_conllu_field("form") for tok in tokens],
+            "pos": [tok.get_conllu_field("xpos") for tok in tokens],
+            "lemmas": [tok.get_conllu_field("lemma") for tok in tokens],
+            "graphs": {"universal-basic": {
+                "edges": [{"parent": tok.get_conllu_field("head").major - 1, "child": i, "label": tok.get_conllu_field("deprel")}
+                          for i, tok in enumerate(tokens) if tok.get_conllu_field("head").major != 0],
+                "roots": [i for i, tok in enumerate(tokens) if tok.get_conllu_field("head").major == 0]}}})
+    return spike_sentences
+
+
+def test_convert_spike_sentences():
+    expected = [api.convert_spike_sentence(spike_sentence) for spike_sentence in make_spike_sentences()]
+    assert list(api.convert_spike_sentences(make_spike_sentences())) == expected
+
+    # in place, converting again reuses the existing edge dicts
+    spike_sentences = list(api.convert_spike_sentences(make_spike_sentences(), in_place=True))
+    assert spike_sentences == expected
+    edge_ids = [[id(edge) for edge in spike_sentence["graphs"]["universal-enhanced"]["edges"]] for spike_sentence in spike_sentences]
+    spike_sentences = list(api.convert_spike_sentences(spike_sentences, in_place=True))
+    assert spike_sentences == expected
+    assert edge_ids == [[id(edge) for edge in spike_sentence["graphs"]["universal-enhanced"]["edges"]] for spike_sentence in spike_sentences]
+
+
+def test_spike_eud_language():
+    hebrew_eud = sorted(get_eud_literal_allowed_set("he") - get_eud_literal_allowed_set("en"))[0]
+
+    def make_spike_sentence():
+        # "He went <hebrew_eud> house", with an nmod whose eud is allowed to appear literally only in Hebrew
+        return {"words": ["He", "went", hebrew_eud, "house"], "pos": ["PRP", "VBD", "IN", "NN"], "lemmas": ["he", "go", hebrew_eud, "house"],
+                "graphs": {"universal-basic": {"edges": [{"parent": 1, "child": 0, "label": "nsubj"}, {"parent": 3, "child": 2, "label": "case"},
+                                                         {"parent": 1, "child": 3, "label": "nmod"}], "roots": [1]}}}
+
+    def nmod_labels(spike_sentence):
+        return [edge["label"] for edge in spike_sentence["graphs"]["universal-enhanced"]["edges"] if edge["label"].startswith("nmod")]
+
+    assert nmod_labels(api.convert_spike_sentence(make_spike_sentence())) == ["nmod:" + hebrew_eud]
+    assert nmod_labels(api.convert_spike_sentence(make_spike_sentence(), eud_language="he")) == ["nmod:" + hebrew_eud]
+    assert nmod_labels(api.convert_spike_sentence(make_spike_sentence(), eud_language="en")) == ["nmod:_other"]
+    assert [nmod_labels(spike_sentence) for spike_sentence in api.convert_spike_sentences([make_spike_sentence()], eud_language="en")] == [["nmod:_other"]]
+    with ParallelConverter(workers=2) as parallel_converter:
+        assert [nmod_labels(spike_sentence) for spike_sentence in parallel_converter.iter_convert_spike_sentences(
+            [make_spike_sentence()], eud_language="en")] == [["nmod:_other"]]
+
+
+def test_conversion_stats():
+    from pybart.stats import ConversionStats
+    dir_ = str(pathlib.Path(__file__).parent.absolute())
+    with open(dir_ + "/handcrafted_tests.conllu") as f:
+        text = f.read()
+    compiled = api.compile_conversions()
+    sentences = []
+    stats = ConversionStats(on_sentence=lambda tokens, iterations, seconds: sentences.append(iterations))
+    assert api.convert_bart_conllu(text, compiled_conversions=compiled, stats=stats) == \
+        api.convert_bart_conllu(text, compiled_conversions=compiled)
+
+    exported = json.loads(stats.to_json())
+    assert exported["sentences"] == len(sentences) == text.strip().count("\n\n") + 1
+    assert sum(exported["iterations"].values()) == len(sentences)
+    assert exported["conversions"]["eud_conj_info"]["edges_added"] > 0
+    assert all(counters["runs"] >= 1 and counters["matches"] >= 0 for counters in exported["conversions"].values())
+    assert 'pybart_conversion_edges_added_total{conversion="eud_conj_info"}' in stats.to_prometheus()
+
+
+def test_label_triggered_scheduling():
+    from pybart.stats import ConversionStats
+    dir_ = str(pathlib.Path(__file__).parent.absolute())
+    with open(dir_ + "/handcrafted_tests.conllu") as f:
+        text = f.read()
+    scheduled = api.compile_conversions()
+    stats = ConversionStats()
+    converted = api.convert_bart_conllu(text, compiled_conversions=scheduled, stats=stats)
+
+    # without the label triggers, every conversion with a touched candidate re-runs
+    unscheduled = api.compile_conversions()
+    unscheduled.matcher.label_triggers = {conv_name: None for conv_name in unscheduled.matcher.label_triggers}
+    unscheduled_stats = ConversionStats()
+    assert api.convert_bart_conllu(text, compiled_conversions=unscheduled, stats=unscheduled_stats) == converted
+    runs = sum(counters.runs for counters in stats.conversions.values())
+    assert runs < sum(counters.runs for counters in unscheduled_stats.conversions.values())
+
+
+def test_conversion_cache(tmp_path):
+    from pybart.cache import ConversionCache
+    dir_ = str(pathlib.Path(__file__).parent.absolute())
+    with open(dir_ + "/handcrafted_tests.conllu") as f:
+        text = f.read().strip()
+    # the repeated sentences continue the numbering of the alternatives (the iids) along the document
+    doubled = text + "\n\n" + text + "\n"
+    expected = api.convert_bart_conllu(doubled)
+    with ConversionCache(path=str(tmp_path / "cache.sqlite")) as cache:
+        assert api.convert_bart_conllu(doubled, cache=cache) == expected
+        statistics = cache.statistics()
+        assert statistics["hits"] >= statistics["misses"] == len(cache)
+        # another configuration doesn't get the results of this one
+        assert api.convert_bart_conllu(doubled, remove_extra_info=True, cache=cache) == \
+            api.convert_bart_conllu(doubled, remove_extra_info=True)
+
+    # a new cache over the same file starts warm, and keeps only max_size sentences in memory
+    with ConversionCache(max_size=10, path=str(tmp_path / "cache.sqlite")) as cache:
+        assert api.convert_bart_conllu(doubled, cache=cache) == expected
+        assert cache.misses == 0 and cache.disk_hits > 0
+        assert len(cache) == 10 and cache.evictions > 0
+
+
+def test_binary_format(tmp_path):
+    from pybart.binary_format import BinaryReader, write_binary
+    dir_ = str(pathlib.Path(__file__).parent.absolute())
+    with open(dir_ + "/handcrafted_tests.conllu") as f:
+        pairs = list(api.iter_convert_bart_conllu(f))
+    converted = [sentence for sentence, _ in pairs]
+    comments = [sentence_comments for _, sentence_comments in pairs]
+    path = str(tmp_path / "converted.bin")
+    assert write_binary(path, converted) == len(converted)
+
+    with BinaryReader(path) as reader:
+        assert len(reader) == len(converted)
+        assert serialize_conllu([sentence.to_tokens() for sentence in reader], comments, False, False) == \
+            serialize_conllu(converted, comments, False, False)
+        # random access, without going through the preceding sentences
+        sentence = reader[-1]
+        assert sentence.field("form") == [token.get_conllu_field("form") for token in converted[-1]]
+        index = {token: i for i, token in enumerate(converted[-1])}
+        assert sorted((child, head, label.to_str(False, False)) for child, head, label in sentence.edges()) == \
+            sorted((index[token], index.get(head, -1), rel.to_str(False, False))
+                   for token in converted[-1] for head, rels in token.get_new_relations() for rel in rels)
+        del sentence
+
+
+def make_odin_documents():
+    documents = {}
+    spike_sentences = make_spike_sentences()
+    for i in range(0, len(spike_sentences), 3):
+        text = ""
+        sentences = []
+        for spike_sentence in spike_sentences[i:i + 3]:
+            start_offsets, end_offsets = [], []
+            for word in spike_sentence["words"]:
+                start_offsets.append(len(text))
+                text += word + " "
+                end_offsets.append(len(text) - 1)
+            basic = spike_sentence["graphs"]["universal-basic"]
+            sentences.append({
+                "words": spike_sentence["words"], "tags": spike_sentence["pos"], "lemmas": spike_sentence["lemmas"],
+                "startOffsets": start_offsets, "endOffsets": end_offsets,
+                "graphs": {"universal-basic": {
+                    "edges": [{"source": edge["parent"], "destination": edge["child"], "relation": edge["label"]} for edge in basic["edges"]],
+                    "roots": basic["roots"]}}})
+        documents[f"doc{i}"] = {"text": text, "sentences": sentences}
+    return documents
+
+
+def test_parse_odin():
+    documents = make_odin_documents()
+    for sentence, odin_sentence in zip(parse_odin(documents["doc0"]), documents["doc0"]["sentences"]):
+        basic = odin_sentence["graphs"]["universal-basic"]
+        # each word gets the head and relation of its edge (the root token is last)
+        assert sorted((tok.get_conllu_field("head").major - 1, i, tok.get_conllu_field("deprel")) for i, tok in enumerate(sentence[:-1])
+                      if tok.get_conllu_field("head").major != 0) == \
+            sorted((edge["source"], edge["destination"], edge["relation"]) for edge in basic["edges"])
+        assert [i for i, tok in enumerate(sentence[:-1]) if tok.get_conllu_field("head").major == 0] == basic["roots"]
+
+
+def test_convert_bart_odin_parallel_and_jsonl():
+    expected = api.convert_bart_odin({"documents": make_odin_documents()})
+    # the words of the first sentence point to their heads in the enhanced graph as they do in the basic one
+    first = expected["documents"]["doc0"]["sentences"][0]["graphs"]
+    assert {(e["source"], e["destination"]) for e in first["universal-basic"]["edges"]} <= \
+        {(e["source"], e["destination"]) for e in first["universal-enhanced"]["edges"]}
+
+    assert api.convert_bart_odin({"documents": make_odin_documents()}, n_process=2) == expected
+
+    # a single document (rather than a "documents" mapping) converts the same
+    assert api.convert_bart_odin(make_odin_documents()["doc0"]) == expected["documents"]["doc0"]
+
+    # the JSON lines are converted in order, in process and over a pool, and the blank lines are skipped
+    for n_process in [1, 2]:
+        lines = [json.dumps(doc) + "\n" for doc in make_odin_documents().values()] + ["\n"]
+        out = io.StringIO()
+        assert api.convert_bart_odin_jsonl(lines, out, n_process=n_process, chunk_size=2) == len(expected["documents"])
+        assert [json.loads(line) for line in out.getvalue().splitlines()] == list(expected["documents"].values())
+
+    # and so do they with the eud language of another language
+    expected_he = api.convert_bart_odin({"documents": make_odin_documents()}, eud_language="he")
+    assert expected_he != expected
+    assert api.convert_bart_odin({"documents": make_odin_documents()}, n_process=2, eud_language="he") == expected_he
+    out = io.StringIO()
+    api.convert_bart_odin_jsonl([json.dumps(doc) for doc in make_odin_documents().values()], out, n_process=2,
+                                eud_language="he")
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == list(expected_he["documents"].values())
+
 
 for cur_func_name in api.get_conversion_names():
     if cur_func_name in ['extra_inner_weak_modifier_verb_reconstruction']:
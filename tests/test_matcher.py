@@ -22,16 +22,31 @@ def stub_get_labels(stub_self, child=0, parent=0):
         return []
 
 
+# the adjacency agrees with stub_get_labels, over a sentence of up to 20 tokens
+def stub_get_parents(stub_self, token_index, child):
+    return [parent for parent in range(20) if parent != child and stub_get_labels(stub_self, child=child, parent=parent)]
+
+
+def stub_get_children(stub_self, token_index, parent):
+    return [child for child in range(20) if child != parent and stub_get_labels(stub_self, child=child, parent=parent)]
+
+
 @pytest.fixture(scope="session", autouse=True)
 def cleanup(request):
     keep_get_text = matcher.get_text
     matcher.get_text = stub_get_text
     keep_get_labels = matcher.get_labels
     matcher.get_labels = stub_get_labels
+    keep_get_parents = matcher.get_parents
+    matcher.get_parents = stub_get_parents
+    keep_get_children = matcher.get_children
+    matcher.get_children = stub_get_children
 
     def remove_test_dir():
         matcher.get_text = keep_get_text
         matcher.get_labels = keep_get_labels
+        matcher.get_parents = keep_get_parents
+        matcher.get_children = keep_get_children
     request.addfinalizer(remove_test_dir)
 
 
@@ -85,6 +100,22 @@ class TestConstraints:
                label_con.satisfied(["bla_nmod", "nmod", "nmod:of", "nsubj", "nsubjpass"])
         assert label_con.satisfied(["bla_nmod", "nsubjpass"]) is None
 
+    def test_regex_label_and_field(self):
+        label_con = HasLabelFromList(["/.subj.*/", "dobj"])
+        assert {"nsubj", "nsubjpass", "dobj"} == label_con.satisfied(["nsubj", "nsubjpass", "dobj", "nmod"])
+        assert label_con.satisfied(["subj", "nmod"]) is None
+        assert HasLabelFromList(["/acl(?!:relcl)/"]).satisfied(["acl:relcl", "acl:to"]) == {"acl:to"}
+
+        # the regex keeps its case, and is matched against the lowercased content
+        verb = Field(FieldNames.TAG, ["/^(VB.?)$/"])
+        assert verb.value == ["/^(VB.?)$/"]
+        assert [verb.satisfied(tok, get_content_by_field) for tok in sentences[0]] == [False, True, False, False]
+        assert not Field(FieldNames.TAG, ["/^VB/"], in_sequence=False).satisfied(sentences[0][1], get_content_by_field)
+
+        # the same pattern is compiled once, and each string is tested once
+        assert verb.regexes[0] is Field(FieldNames.TAG, ["/^(VB.?)$/", "nn"]).regexes[0]
+        assert verb.regexes[0].results == {"prp": False, "vbd": True, "rb": False, "nn": False}
+
     def test_has_no_label(self):
         no_label_con1 = HasNoLabel('nmod')
         no_label_con2 = HasNoLabel('nsubj')
@@ -239,6 +270,27 @@ class TestMatcher:
              {"a": 1, "b": 3, "c": 6, "d": 2, "e": 100, "f": 200},
              {"a": 4, "b": 5, "c": 8, "d": 1000, "e": 100, "f": 200}]
 
+    def test_merge_edges_assignments_optional_and_pruning(self):
+        edges_assignments = [
+            (False, [{"a": i, "b": i + 100} for i in range(10)]),
+            (False, [{"b": 105, "c": 200}, {"b": 103, "c": 201}]),
+            (True, [{"c": 200, "d": 300}, {"c": 201, "d": 5}, {"c": 200, "d": 3}, {"c": 7, "d": 8}])]
+        # the smaller required edge is joined first
+        assert GlobalMatcher._plan_merge_order(edges_assignments) == [1, 0, 2]
+        # but the output keeps the declared order
+        assert GlobalMatcher._merge_edges_assignments(edges_assignments) == \
+            [{"a": 3, "b": 103, "c": 201, "d": 5},
+             {"a": 5, "b": 105, "c": 200, "d": 300},
+             {"a": 5, "b": 105, "c": 200, "d": 3}]
+        # a filter over the bound tokens drops merges early (without falling back to skipping the optional edge)
+        assert GlobalMatcher._merge_edges_assignments(edges_assignments, lambda merged: merged.get("d") != 5) == \
+            [{"a": 5, "b": 105, "c": 200, "d": 300},
+             {"a": 5, "b": 105, "c": 200, "d": 3}]
+        # and the plain fold, used below the planning threshold, gives the same merges
+        for is_consistent in [None, lambda merged: merged.get("d") != 5]:
+            assert GlobalMatcher._fold_edges_assignments(edges_assignments, is_consistent) == \
+                GlobalMatcher._merge_edges_assignments(edges_assignments, is_consistent)
+
     def test_gm_apply(self):
         # no merges
         gm = GlobalMatcher(Full())
@@ -256,6 +308,18 @@ class TestMatcher:
             assert res.token("tok2") == 12
             assert res.token("tok3") == -1
 
+    def test_gm_apply_keeps_no_state(self):
+        gm = GlobalMatcher(Full(tokens=[Token("tok1"), Token("tok2"), Token("tok3", capture=False)],
+                                edges=[Edge("tok1", "tok2", [HasLabelFromList(["some_label"])]),
+                                       Edge("tok1", "tok3", [HasLabelFromList(["some_label"])])]))
+        state = dict(vars(gm))
+        for i in range(1000):
+            for res in gm.apply({"tok1": [1], "tok2": [i + 3], "tok3": [2]}, sentences[0]):
+                # only the labels of the current assignment are returned
+                assert res.indices2label == {(1, i + 3): {"some_label"}}
+        # a reused matcher mustn't accumulate anything between calls
+        assert vars(gm) == state
+
     def test_post_spacy_matcher(self):
         # empty matched_tokens
         tm = TokenMatcher([])
@@ -282,6 +346,17 @@ class TestMatcher:
                            Token("verb", spec=[Field(FieldNames.TAG, ["VBD", "VB"])])])
         assert {"tok1": [0], "verb": [1, 3]} == tm.apply(sentences[2])
 
+    def test_token_field_index(self):
+        index = TokenFieldIndex(sentences[0])
+        assert index.lookup(Field(FieldNames.TAG, ["NN", "RB"])) == {2, 3}
+        assert index.lookup(Field(FieldNames.LEMMA, ["go"], in_sequence=False)) == {0, 2, 3}
+        assert index.lookup(Field(FieldNames.WORD, ["by"])) == set()
+
+        # a shared index gives the same matches as the per-token scan
+        tm = TokenMatcher([Token("tok1", spec=[Field(FieldNames.TAG, ["NN", "RB"]),
+                                               Field(FieldNames.WORD, ["home"], in_sequence=False)])])
+        assert {"tok1": [3]} == tm.apply(sentences[0], index) == tm.apply(sentences[0])
+
 
 class TestMatch:
     def test_matched_for(self):
@@ -328,3 +403,51 @@ def test_preprocess_constraint():
     assert ret.tokens[2].spec[0].field == FieldNames.WORD
 
 
+
+
+def test_label_triggers():
+    triggers = get_label_triggers(Full(
+        tokens=[Token("tok1", outgoing_edges=[HasNoLabel("dobj")]), Token("tok2")],
+        edges=[Edge("tok1", "tok2", [HasLabelFromList(["nsubj", "/^nmod:.*/"])])]))
+    assert triggers.labels == {"nsubj", "dobj"}
+    assert triggers.matches("nmod:of") and triggers.matches("dobj") and not triggers.matches("nmod")
+    # when some edge may match whatever its label, any label may change the matches
+    assert get_label_triggers(Full(tokens=[Token("tok1"), Token("tok2")],
+                                   edges=[Edge("tok1", "tok2", [HasNoLabel("dobj")])])) is None
+    assert get_label_triggers(Full(tokens=[Token("tok1", no_children=True)])) is None
+
+
+def test_required_features_prefilter():
+    from pybart.graph_token import add_basic_edges, Label
+    constraint = Full(
+        tokens=[Token("verb", spec=[Field(FieldNames.TAG, ["/^VB/"])]), Token("obj", optional=True), Token("mod")],
+        edges=[Edge("mod", "verb", [HasLabelFromList(["advmod", "/^nmod:/"])]),
+               Edge("obj", "verb", [HasLabelFromList(["dobj"])])])
+    assert get_required_features(constraint) == [
+        FeatureRequirement(FieldNames.TAG, frozenset(), (Field(FieldNames.TAG, ["/^VB/"]).regexes[0],)),
+        FeatureRequirement("label", frozenset({"advmod"}), (HasLabelFromList(["/^nmod:/"]).regexes[0],))]
+
+    sentence = [BartToken(TokenId(1), "He", "he", "", "PRP", "", TokenId(2), "nsubj", "", ""),
+                BartToken(TokenId(2), "went", "go", "", "VBD", "", TokenId(0), "root", "", ""),
+                BartToken(TokenId(3), "home", "home", "", "NN", "", TokenId(2), "obl", "", ""),
+                BartToken(TokenId(0), None, None, None, None, None, None, None, None, None)]
+    add_basic_edges(sentence)
+    sentence = sentence[:-1]
+    tracker = EditTracker()
+    _ = [tok.set_tracker(tracker) for tok in sentence]
+    match = Matcher([NamedConstraint("constraint", constraint)])(sentence, tracker)
+    # neither advmod nor nmod:* edges (the optional dobj doesn't matter)
+    assert not match.may_match("constraint")
+    assert list(match.matches_for("constraint")) == []
+    # the label features are collected again after the sentence is edited
+    sentence[2].replace_edge(Label("obl"), Label("nmod:tmod"), sentence[1], sentence[1])
+    assert match.may_match("constraint")
+
+    # the features of the sentence can be built once and shared by the matches of several calls
+    matcher = Matcher([NamedConstraint("constraint", constraint)])
+    features = matcher.features(sentence, tracker)
+    assert matcher(sentence, tracker, features)._get_features() is features
+    assert matcher(sentence, tracker, features)._get_index() is features.index
+    # until a node is added to the sentence
+    sentence.append(BartToken(TokenId(3, 1), "went", "go", "", "VBD", "", None, "", "", ""))
+    assert matcher(sentence, tracker, features)._get_features() is not features